@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Headless benchmark and fairness harness for the round generators:
+# schedule_round (main.py), generate_round (modules/main.py) and the
+# whole-night planner. Runs simulated nights over a matrix of roster sizes,
+# court counts and formats, and writes the numbers to JSON.
+#
+#   python benchmarks/scheduler_bench.py --output bench.json
+#   python benchmarks/scheduler_bench.py --quick --compare bench.json
+#   python benchmarks/scheduler_bench.py --quick --seed 7   # same nights every run
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.history import PairHistory
+from modules.planner import plan_night
+from modules.rounds import generate_round, schedule_round
+
+PLAYER_COUNTS = [4, 8, 16, 30, 60, 100, 250, 500]
+COURT_COUNTS = [1, 2, 4, 8, 15, 30, 60]
+QUICK_PLAYER_COUNTS = [8, 30, 100]
+QUICK_COURT_COUNTS = [2, 8, 15]
+MATCH_TYPES = ['Singles', 'Doubles']
+
+
+# Each runner plays one night and returns, per round, the seconds it took,
+# the groups that shared a court and who played American doubles. With an
+# rng (from --seed) every draw comes from it, so a night can be run again.
+
+def run_schedule_round(players, courts, match_type, american, rounds, rng=None):
+    history = PairHistory(players)
+    rotation = None
+    night = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        matches, history, rotation = schedule_round(players, courts, match_type, american, history, rotation,
+                                                    rng=rng)
+        seconds = time.perf_counter() - start
+        groups = [m for _, m in matches]
+        night.append((seconds, groups, [p for m in groups if len(m) == 3 for p in m]))
+    return night
+
+
+def run_generate_round(players, courts, match_type, american, rounds, rng=None):
+    history = PairHistory(players)
+    recent = None
+    leftover_option = "Play American Doubles" if american else "Rest"
+    night = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        matches, recent = generate_round(players, courts, match_type, leftover_option, history, recent, rng=rng)
+        seconds = time.perf_counter() - start
+        groups = [m for court, m in matches if court != "Rest"]
+        night.append((seconds, groups, [p for court, m in matches if court == "Rotate" for p in m]))
+    return night
+
+
+def run_plan_night(players, courts, match_type, american, rounds, rng=None):
+    start = time.perf_counter()
+    plan = plan_night(players, courts, rounds, match_type, american, rng=rng)
+    seconds = (time.perf_counter() - start) / max(rounds, 1)
+    return [(seconds, [m for _, m in entry['matches']], entry['american']) for entry in plan]
+
+
+SCHEDULERS = {
+    'schedule_round': run_schedule_round,
+    'generate_round': run_generate_round,
+    'plan_night': run_plan_night,
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def variance(values):
+    mean = sum(values) / len(values)
+    return sum((v - mean) ** 2 for v in values) / len(values)
+
+
+def night_fairness(players, night):
+    seen = set()
+    pairs = repeats = 0
+    rests = dict.fromkeys(players, 0)
+    american = dict.fromkeys(players, 0)
+    for _, groups, american_players in night:
+        on_court = set()
+        for group in groups:
+            on_court.update(group)
+            for i in range(len(group)):
+                for j in range(i + 1, len(group)):
+                    pair = frozenset((group[i], group[j]))
+                    pairs += 1
+                    if pair in seen:
+                        repeats += 1
+                    seen.add(pair)
+        for p in players:
+            if p not in on_court:
+                rests[p] += 1
+        for p in american_players:
+            american[p] += 1
+    return {
+        'repeat_pair_rate': repeats / pairs if pairs else 0.0,
+        'rest_variance': variance(list(rests.values())),
+        'rest_spread': max(rests.values()) - min(rests.values()),
+        'american_spread': max(american.values()) - min(american.values()),
+    }
+
+
+def night_rng(seed, *case):
+    # One stream per night of each case, so cases can run in any order
+    return None if seed is None else random.Random(repr((seed,) + case))
+
+
+def bench_case(name, player_count, court_count, match_type, american, rounds, nights, seed=None):
+    runner = SCHEDULERS[name]
+    players = [f"Player {i + 1}" for i in range(player_count)]
+    courts = [str(i + 1) for i in range(court_count)]
+
+    latencies = []
+    fairness = []
+    case = (name, player_count, court_count, match_type, american)
+    for n in range(nights):
+        night = runner(players, courts, match_type, american, rounds, night_rng(seed, *case, n))
+        latencies.extend(seconds for seconds, _, _ in night)
+        fairness.append(night_fairness(players, night))
+
+    # Memory is measured on a separate night; tracemalloc skews timings
+    tracemalloc.start()
+    runner(players, courts, match_type, american, rounds, night_rng(seed, *case, nights))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'scheduler': name,
+        'players': player_count,
+        'courts': court_count,
+        'match_type': match_type,
+        'american': american,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_kb': peak / 1024,
+    }
+    for metric in fairness[0]:
+        result[metric] = sum(f[metric] for f in fairness) / len(fairness)
+    return result
+
+
+def case_key(result):
+    return (result['scheduler'], result['players'], result['courts'], result['match_type'], result['american'])
+
+
+def compare(results, baseline_path, slower=1.2):
+    with open(baseline_path) as f:
+        baseline = {case_key(r): r for r in json.load(f)['results']}
+    flagged = 0
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+        notes = []
+        if result['p99_ms'] > old['p99_ms'] * slower and result['p99_ms'] - old['p99_ms'] > 1:
+            notes.append(f"p99 {old['p99_ms']:.1f} -> {result['p99_ms']:.1f} ms")
+        if result['repeat_pair_rate'] > old['repeat_pair_rate'] + 0.01:
+            notes.append(f"repeats {old['repeat_pair_rate']:.3f} -> {result['repeat_pair_rate']:.3f}")
+        if notes:
+            flagged += 1
+            print("REGRESSION", case_key(result), "; ".join(notes))
+    print(f"{flagged} regression(s) against {baseline_path}")
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the round schedulers headless.")
+    parser.add_argument('--schedulers', nargs='+', default=list(SCHEDULERS), choices=list(SCHEDULERS))
+    parser.add_argument('--players', nargs='+', type=int)
+    parser.add_argument('--courts', nargs='+', type=int)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--nights', type=int, default=3)
+    parser.add_argument('--quick', action='store_true', help="small matrix for a fast check")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="earlier results JSON to check for regressions")
+    parser.add_argument('--seed', type=int, help="seed every night, so fairness numbers repeat exactly")
+    args = parser.parse_args(argv)
+
+    player_counts = args.players or (QUICK_PLAYER_COUNTS if args.quick else PLAYER_COUNTS)
+    court_counts = args.courts or (QUICK_COURT_COUNTS if args.quick else COURT_COUNTS)
+
+    results = []
+    for name in args.schedulers:
+        for player_count in player_counts:
+            for court_count in court_counts:
+                for match_type in MATCH_TYPES:
+                    step = 2 if match_type == 'Singles' else 4
+                    if court_count * step > 2 * player_count:
+                        continue  # mostly empty courts, nothing to measure
+                    for american in (False, True):
+                        result = bench_case(name, player_count, court_count, match_type,
+                                            american, args.rounds, args.nights, args.seed)
+                        results.append(result)
+                        print(f"{name:15} {player_count:4}p {court_count:3}c {match_type:8} "
+                              f"am={'y' if american else 'n'}  p50 {result['p50_ms']:7.2f} ms  "
+                              f"p99 {result['p99_ms']:7.2f} ms  repeats {result['repeat_pair_rate']:.3f}  "
+                              f"rest var {result['rest_variance']:.2f}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'rounds': args.rounds,
+            'nights': args.nights,
+            'seed': args.seed,
+            'results': results,
+        }, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
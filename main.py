@@ -1,339 +1,460 @@
 import streamlit as st
-import random
-import json
 import os
-import pandas as pd
-from io import BytesIO
-from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from datetime import date, datetime, time
+from functools import lru_cache
+from modules.admin import admin_panel, run_instrumented
+from modules.archive import get_archive
+from modules.courts import SURFACES, compact_court, court_info, parse_windows
+from modules.export import export_night, night_digest
+from modules.night import Night
+from modules.planner import present_players
+from modules.ratings import RatingBook
+from modules.replay import new_seed, round_seeds, schedule
+from modules.service import SchedulerBusy, get_scheduler
+from modules.scoring import (SCORE_FILE, keep_scores, leaderboard, load_ratings, load_scores, load_stats,
+                             update_scores)
+from modules.stats import STAT_COLUMNS, PlayerStats
+from modules.timer import render_timer, start_timer
+from utils.metrics import count, span
+from utils.nightstate import VersionConflict, get_night_store, night_key
+from utils.persistence import get_storage, import_legacy, load_data
 
 st.set_page_config(page_title="Tennis Scheduler", layout="wide")
 
 # File paths
 PLAYER_FILE = "players.json"
 COURT_FILE = "courts.json"
-SCORE_FILE = "scores.csv"
+SCORE_LOG_FILE = "score_log.csv"
+STYLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "app.css")
 
 # Load and save functions
-def load_json(path, default=[]):
-    if os.path.exists(path):
-        with open(path, 'r') as f:
-            return json.load(f)
-    return default
-
-def save_json(path, data):
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=2)
-
-def load_scores():
-    if os.path.exists(SCORE_FILE):
-        return pd.read_csv(SCORE_FILE, index_col=0)
-    return pd.DataFrame(columns=['games'])
-
-def save_scores(df):
-    df.to_csv(SCORE_FILE)
-
-# Scheduler logic
-def schedule_round(players, courts, match_type='Singles', allow_american=False, history=None, player_roles=None):
-    if history is None:
-        history = set()
-    if player_roles is None:
-        player_roles = {p: [] for p in players}
-
-    matches = []
-    players = players.copy()
-
-    def penalty(p):
-        recent = player_roles.get(p, [])
-        return recent[-1:] == ['rest'] or recent[-1:] == ['american']
-
-    players.sort(key=penalty)
-    random.shuffle(players)
-
-    court_capacity = 2 if match_type == 'Singles' else 4
-    max_players = len(courts) * court_capacity
-    usable_players = players[:max_players]
-    leftover_players = players[max_players:]
-
-    step = 2 if match_type == 'Singles' else 4
-
-    for i in range(0, len(usable_players), step):
-        match = tuple(usable_players[i:i+step])
-        if len(match) == step:
-            matches.append(match)
-            for p in match:
-                player_roles.setdefault(p, []).append("match")
-
-    lp = leftover_players
-    if allow_american:
-        if len(lp) == 1:
-            convertible_idx = next((i for i, m in enumerate(matches) if len(m) == 4), None)
-            if convertible_idx is not None:
-                match_to_split = matches.pop(convertible_idx)
-                singles_match = match_to_split[:2]
-                american_group = match_to_split[2:] + lp
-                matches.append(singles_match)
-                matches.append(tuple(american_group))
-                for p in singles_match:
-                    player_roles.setdefault(p, []).append("match")
-                for p in american_group:
-                    player_roles.setdefault(p, []).append("american")
-            else:
-                for p in lp:
-                    player_roles.setdefault(p, []).append("rest")
-        elif len(lp) == 2:
-            matches.append(tuple(lp))
-            for p in lp:
-                player_roles.setdefault(p, []).append("match")
-        elif len(lp) == 3:
-            matches.append(tuple(lp))
-            for p in lp:
-                player_roles.setdefault(p, []).append("american")
-        else:
-            for p in lp:
-                player_roles.setdefault(p, []).append("rest")
-    else:
-        for p in lp:
-            player_roles.setdefault(p, []).append("rest")
-
-    all_matched_players = set(p for m in matches for p in m)
-    resting = set(players) - all_matched_players
-    for p in resting:
-        player_roles.setdefault(p, []).append("rest")
-
-    for m in matches:
-        history.add(frozenset(m))
-
-    named_matches = [(court, match) for court, match in zip(courts, matches)]
-    return named_matches, history, player_roles
-
-def update_scores(nightly_df, all_time_df, submitted_scores):
-    for player, score in submitted_scores.items():
-        if player not in nightly_df.index:
-            nightly_df.loc[player] = 0
-        nightly_df.at[player, 'games'] += score
-        if player not in all_time_df.index:
-            all_time_df.loc[player] = 0
-        all_time_df.at[player, 'games'] += score
+def open_storage():
+    storage = get_storage()
+    import_legacy(storage, load_data(PLAYER_FILE), load_data(COURT_FILE), SCORE_LOG_FILE)
+    return storage
+
+@lru_cache(maxsize=1)
+def app_style():
+    with open(STYLE_FILE) as f:
+        return f"<style>\n{f.read()}</style>"
+
+@lru_cache(maxsize=256)
+def round_summary(number, matches, scores):
+    # scores line up with the players of matches, court by court
+    scores = iter(scores)
+    lines = [f"**Round {number}**"]
+    for court, match in matches:
+        lines.append(f"- {court}: " + ", ".join(f"{player} {next(scores)}" for player in match))
+    return "\n".join(lines)
+
+def new_night_id():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
 
 def app():
-    st.markdown("""
-    <style>
-        /* General styling for the app */
-        html, body, [class*="css"] {
-            font-size: 20px !important;
-        }
-        .block-container {
-            padding-top: 2rem;
-            padding-bottom: 2rem;
-            background-color: #000000;  /* Dark background for the main app screen */
-            color: #ffffff;  /* White text on dark background */
-        }
-    
-        .stButton>button {
-            background-color: #32CD32;
-            color: white;
-            border-radius: 0.5rem;
-            padding: 0.5rem 1rem;
-            font-size: 18px;
-        }
-    
-        /* Set white text color for headings on the main app screen */
-        h1, h2, h3, h4, h5, h6, .stMarkdown h3 {
-            color: #ffffff !important;
-        }
-    
-        /* Specific styling for labels in input components, select boxes, etc. */
-        /* Targeting labels using a more specific class */
-        .stTextInput label, 
-        .stSelectbox label, 
-        .stCheckbox label, 
-        .stMultiselect label,
-        .stRadio label,
-        .stSlider label {
-            color: #ffffff !important;  /* White text for all labels */
-        }
-    
-        /* Ensure black text for inputs and selects (on light backgrounds) */
-        input[type=number], 
-        .stTextInput input, 
-        .stSelectbox>div>div, 
-        .stCheckbox>label>div, 
-        .stMultiselect>div>div, 
-        .stRadio>div, 
-        .stSlider>div {
-            font-size: 20px !important;
-            color: #000000 !important;  /* Black text for inputs and selects */
-            background-color: #ffffff !important; /* White background for inputs/selects */
-        }
-    
-        /* Set bright yellow color for "Set Stopwatch" text and icons */
-        .stTextInput div[role="alert"], 
-        .stTextInput div[role="button"], 
-        .stTextInput span, 
-        .stTextInput i {
-            color: #ff0 !important;  /* Force bright yellow for stopwatch text and icons */
-        }
-    
-        /* Red buttons for deleting players and courts */
-        div[data-testid="delete-player"] > button,
-        div[data-testid="delete-court"] > button {
-            background-color: #d9534f;
-            color: white;
-            font-weight: bold;
-            border-radius: 0.5rem;
-        }
-    
-        /* Sidebar styling */
-        section[data-testid="stSidebar"] {
-            background-color: #d3d3d3 !important;
-            color: #000000 !important;
-        }
-        section[data-testid="stSidebar"] label,
-        section[data-testid="stSidebar"] span,
-        section[data-testid="stSidebar"] div {
-            color: #000000 !important;
-        }
-        /* Change the heading text color in the sidebar */
-        section[data-testid="stSidebar"] h2 {
-            color: #000000 !important; /* Black color for the "Manage Players and Tabs" heading */
-        }
-    
-        /* Sidebar Tab - Keep same format but change tab color */
-        .stTabs>div>div {
-            background-color: #ffff00 !important; /* Bright yellow background for the tabs */
-            color: #000000 !important; /* Black text for tabs */
-        }
-    
-        /* Adjust slider size to provide more space for text */
-        .stSlider {
-            width: 100% !important;
-            height: 60px !important;  /* Increase the height of the slider */
-        }
-    
-        /* Add space for the slider labels to display more clearly */
-        .stSlider>div>div>div {
-            padding-top: 10px !important;  /* Add space between the slider and the text */
-            font-size: 22px !important;  /* Increase font size for slider labels */
-            color: #ffffff !important;  /* White text for slider labels */
-        }
-    </style>
-    
-    """, unsafe_allow_html=True)
+    st.markdown(app_style(), unsafe_allow_html=True)
 
     st.title("🎾 Tennis Round-Robin Scheduler")
 
-    players = load_json(PLAYER_FILE)
-    courts = load_json(COURT_FILE)
-
-    if 'all_time' not in st.session_state:
-        st.session_state.all_time = load_scores()
-
-    if 'nightly' not in st.session_state:
-        st.session_state.nightly = pd.DataFrame(0, index=players, columns=['games'])
-    if 'history' not in st.session_state or not isinstance(st.session_state.history, list):
-        st.session_state.history = []
-    if 'rounds' not in st.session_state:
-        st.session_state.rounds = []
-    if 'round_number' not in st.session_state:
-        st.session_state.round_number = 1
-    if 'player_roles' not in st.session_state:
-        st.session_state.player_roles = {p: [] for p in players}
+    if 'storage' not in st.session_state:
+        st.session_state.storage = open_storage()
+    storage = st.session_state.storage
+
+    with span('load.storage'):
+        players = list(storage.players())
+        courts = list(storage.courts())
+        court_entries = {court_info(entry)['name']: entry for entry in storage.court_entries()}
+        ledger = load_scores(storage)
+        ratings = load_ratings(storage)
+        stats = load_stats(storage)
+
+    # The night itself (rounds, history, rotation) is shared between devices
+    # through the night store; only the round being viewed is per device.
+    params = st.query_params
+    if 'night_id' not in st.session_state:
+        st.session_state.night_id = params.get('night') or new_night_id()
+    if 'current_round' not in st.session_state:
+        st.session_state.current_round = 0
 
     with st.sidebar:
         st.header("Manage Players & Courts")
         new_player = st.text_input("Add Player")
         if st.button("Add Player") and new_player:
-            if new_player not in players:
+            if storage.add_player(new_player):
                 players.append(new_player)
-                save_json(PLAYER_FILE, players)
             else:
                 st.warning("Player already exists!")
 
         player_to_delete = st.selectbox("Delete Player", players, key="delete-player-select")
         if st.button("Delete Player", key="delete-player"):
-            if player_to_delete in players:
+            if storage.remove_player(player_to_delete):
                 players.remove(player_to_delete)
-                save_json(PLAYER_FILE, players)
                 st.success(f"Deleted {player_to_delete}")
 
         new_court = st.text_input("Add Court")
         if st.button("Add Court") and new_court:
-            if new_court not in courts:
+            if storage.add_court(new_court):
                 courts.append(new_court)
-                save_json(COURT_FILE, courts)
             else:
                 st.warning("Court already exists!")
 
         court_to_delete = st.selectbox("Delete Court", courts, key="delete-court-select")
         if st.button("Delete Court", key="delete-court"):
-            if court_to_delete in courts:
+            if storage.remove_court(court_to_delete):
                 courts.remove(court_to_delete)
-                save_json(COURT_FILE, courts)
                 st.success(f"Deleted {court_to_delete}")
 
+        with st.expander("Court Settings"):
+            court_to_edit = st.selectbox("Court", courts, key="edit-court-select")
+            if court_to_edit:
+                info = court_info(court_entries.get(court_to_edit, court_to_edit))
+                # A surface written by hand or by another backend may not be one we know
+                known = SURFACES.index(info['surface']) if info['surface'] in SURFACES else 0
+                surface = st.selectbox("Surface", SURFACES, index=known)
+                lit = st.checkbox("Floodlit", value=info['lit'])
+                singles_only = st.checkbox("Singles Only", value=info['singles_only'])
+                match_minutes = st.number_input("Match Length Override (minutes, 0 = none)", min_value=0,
+                                                max_value=120, value=info['match_minutes'] or 0)
+                windows = st.text_input("Available (e.g. 18:00-20:00, 21:00-22:30)",
+                                        value=", ".join(f"{a}-{b}" for a, b in info['windows']))
+                if st.button("Save Court"):
+                    try:
+                        info.update(surface=surface, lit=lit, singles_only=singles_only,
+                                    match_minutes=match_minutes or None, windows=parse_windows(windows))
+                        storage.save_court(compact_court(info))
+                        st.success(f"Saved {court_to_edit}")
+                    except ValueError:
+                        st.warning("Availability should look like 18:00-20:00, 21:00-22:30")
+
+        st.header("Club Night")
+        club = st.text_input("Club", value=params.get('club', 'club'))
+        st.text_input("Night ID", key="night_id")
+        params['club'] = club
+        params['night'] = st.session_state.night_id
+        st.caption("Open this page with the same club and night ID on every device to share the night.")
+
+    nights = get_night_store(Night)
+    key = night_key(club, st.session_state.night_id)
+    with span('load.night'):
+        version, night = nights.get(key)
+
+    def submit(record, matches, entered, expected=None):
+        # One court merges into the latest night state, so courts submitted
+        # from different devices never clash; a whole round is only
+        # accepted against the version this device last showed.
+        with span('submit'):
+            if expected is None:
+                merge = lambda state: state.set_scores(state.round(record.number), entered)
+                new_version, _ = nights.update(key, merge)
+            else:
+                night.set_scores(record, entered)
+                new_version = nights.commit(key, expected, night)
+            st.session_state.night_version = (key, new_version)
+            submitted = {'round': record.number, 'matches': matches, 'scores': entered}
+            return update_scores(ledger, st.session_state.night_id, submitted, ratings, stats)
+
     selected_players = st.multiselect("Select Players for This Night", sorted(set(players)))
+    with st.expander("Arrivals & Departures"):
+        # Kept with the night; rounds are drawn from whoever is there when
+        # they start, and nobody's rest or pairing history is reset.
+        who = st.selectbox("Player", selected_players, key="availability-player")
+        if who:
+            shown_windows = night.availability.get(who, [])
+            here = st.text_input("Here (e.g. 19:30- arriving late, -21:00 leaving early)",
+                                 value=", ".join(f"{'' if a == '00:00' else a}-{'' if b == '24:00' else b}"
+                                                 for a, b in shown_windows))
+            if st.button("Save Availability"):
+                try:
+                    windows = parse_windows(here)
+                    version, night = nights.update(key, lambda state: state.set_availability(who, windows))
+                    st.success(f"Saved availability for {who}")
+                except ValueError:
+                    st.warning("Availability should look like 19:30-, -21:00 or 18:00-20:00")
+        now = datetime.now()
+        away = [p for p in selected_players
+                if p not in present_players(selected_players, night.availability, now.hour * 60 + now.minute)]
+        if away:
+            st.caption("Not here now: " + ", ".join(away))
+
     selected_courts = st.multiselect("Select Active Courts", sorted(set(courts)))
+    surface = st.selectbox("Court Surface", ["Any"] + SURFACES)
+    sunset = st.time_input("Sunset (unlit courts close)", value=time(20, 30))
+    dusk = sunset.hour * 60 + sunset.minute
+    night_courts = [court_entries.get(name, name) for name in selected_courts]
+    if surface != "Any":
+        night_courts = [c for c in night_courts if court_info(c)['surface'] == surface]
     match_type = st.selectbox("Match Type", ["Singles", "Doubles"])
     format_type = st.selectbox("Format", ["Fast Four", "Timed"], index=1)
     if format_type == "Timed":
         match_duration = st.slider("Match Duration (minutes)", min_value=5, max_value=60, value=15, step=5)
         st.info(f"⏱ Set stopwatch to **{match_duration} minutes**")
     allow_american = st.checkbox("Allow American Doubles")
+    balance_skill = st.checkbox("Balance Teams by Skill")
+    skill = ratings.snapshot() if balance_skill else None
+    ladder = st.checkbox("Ladder (winners move up a court, losers down)")
+    if ladder:
+        st.caption("Courts rank top to bottom in the order selected; entered scores decide the next round.")
+
+    scheduler = get_scheduler()
+
+    def request_step(seed, **settings):
+        # Rounds are drawn by the shared scheduling service, off this
+        # script run; the result is picked up below, on this run if it's
+        # ready in time, otherwise on a later one. Seeded here, so adopting
+        # it or drawing it again (after a clash, or when the job failed or
+        # ran past its deadline) gives the same round.
+        try:
+            ticket = scheduler.submit(night, selected_players, seed, **settings)
+        except SchedulerBusy:
+            ticket = None  # drawn in this run instead
+        st.session_state.pending_step = {'key': key, 'ticket': ticket, 'steps': len(night.log),
+                                         'rounds': len(night.rounds), 'players': selected_players,
+                                         'seed': seed, 'settings': settings}
 
     if st.button("Generate Round"):
-        previous_history = st.session_state.history
-        if not isinstance(previous_history, list):
-            previous_history = []
-
-        history_set = set(frozenset(h) for h in previous_history)
-
-        matches, history_set, st.session_state.player_roles = schedule_round(
-            selected_players, selected_courts, match_type, allow_american,
-            history_set, st.session_state.player_roles)
-
-        st.session_state.history = [tuple(m) for m in history_set]
-
-        st.session_state.rounds.append({
-            'round': st.session_state.round_number,
-            'matches': matches,
-            'scores': {player: 0 for _, m in matches for player in m}
-        })
-        st.session_state.round_number += 1
-
-    for round_info in st.session_state.rounds:
-        with st.expander(f"Round {round_info['round']}", expanded=(round_info['round'] == st.session_state.round_number - 1)):
-            for court_name, match in round_info['matches']:
-                with st.container():
-                    st.markdown(f"### {court_name}")
-                    for player in match:
-                        score = st.number_input(f"{player} score", min_value=0, key=f"r{round_info['round']}_{player}")
-                        round_info['scores'][player] = score
-
-            if st.button(f"Submit Scores for Round {round_info['round']}"):
-                update_scores(st.session_state.nightly, st.session_state.all_time, round_info['scores'])
-                save_scores(st.session_state.all_time)
-                st.success(f"Scores for Round {round_info['round']} submitted.")
+        now = datetime.now()
+        with span('schedule.round'):
+            request_step(new_seed(), courts=night_courts, match_type=match_type, allow_american=allow_american,
+                         ratings=skill, at=now.hour * 60 + now.minute, dusk=dusk,
+                         availability=night.availability, ladder=ladder)
+
+    rounds_to_plan = st.number_input("Rounds to Plan", min_value=1, max_value=30, value=8)
+    if st.button("Plan Whole Night", disabled=ladder):
+        # Timed rounds have a known length, so later rounds can follow the
+        # courts' availability; otherwise plan for the courts open now.
+        now = datetime.now()
+        round_minutes = match_duration if format_type == "Timed" else 0
+        with span('schedule.plan'):
+            request_step(new_seed(), kind='plan', rounds=rounds_to_plan, courts=night_courts,
+                         match_type=match_type, allow_american=allow_american, ratings=skill,
+                         at=now.hour * 60 + now.minute, round_minutes=round_minutes, dusk=dusk,
+                         availability=night.availability)
+
+    pending = st.session_state.get('pending_step')
+    if pending and pending['key'] == key:
+        done = None
+        if pending['ticket'] is not None:
+            with span('schedule.wait'), st.spinner("Scheduling..."):
+                try:
+                    done = scheduler.wait(pending['ticket'])
+                except Exception:
+                    # Dropped from the service's cache, past its deadline
+                    # or failed (a worker dying too): draw it here instead
+                    count('schedule.fallback')
+                    pending['ticket'] = None
+        if pending['ticket'] is not None and done is None:
+            st.info("Still scheduling; the new rounds will show once they're ready.")
+
+            @st.fragment(run_every=1)
+            def watch_step(ticket):
+                # Polls on its own; reruns the page to adopt the step once
+                # it's ready, or to draw it here if it failed
+                try:
+                    ready = scheduler.poll(ticket) is not None
+                except Exception:
+                    ready = True
+                if ready:
+                    st.rerun()
+
+            watch_step(pending['ticket'])
+        else:
+            # Cleared first, so a step that fails here too isn't retried on
+            # every rerun
+            del st.session_state.pending_step
+            first = {}
+
+            def add_step(state):
+                # Adopted unless another device scheduled meanwhile, when
+                # the same seeded step runs on the latest night instead
+                first['round'] = len(state.rounds) + 1
+                if done is not None and (len(state.log), len(state.rounds)) == (pending['steps'], pending['rounds']):
+                    state.adopt(done)
+                else:
+                    schedule(state, pending['players'], pending['seed'], **pending['settings'])
+
+            with span('schedule.adopt'):
+                version, night = nights.update(key, add_step)
+                for record in night.rounds[first['round'] - 1:]:
+                    storage.save_round(st.session_state.night_id, record.number, night.matches(record))
+            st.session_state.current_round = first['round']
+
+    if night.rounds and not 1 <= st.session_state.current_round < night.round_number:
+        st.session_state.current_round = night.round_number - 1
+    if night.rounds:
+        col1, col2 = st.columns(2)
+        if col1.button("◀ Previous Round") and st.session_state.current_round > 1:
+            st.session_state.current_round -= 1
+        if col2.button("Next Round ▶") and st.session_state.current_round < night.round_number - 1:
+            st.session_state.current_round += 1
+
+        if format_type == "Timed":
+            # Courts with their own match length get a clock of their own
+            clock_key = f"{st.session_state.night_id}:round{st.session_state.current_round}"
+            if st.button(f"Start Clock for Round {st.session_state.current_round}"):
+                start_timer(clock_key, match_duration)
+                for court_name, _ in night.matches(night.round(st.session_state.current_round)):
+                    minutes = court_info(court_entries.get(court_name, court_name))['match_minutes']
+                    if minutes:
+                        start_timer(f"{clock_key}:{court_name}", minutes)
+            render_timer(clock_key)
+
+    # Only the round being played (or one picked for editing) gets score
+    # inputs; every other round is a cached read-only summary.
+    editing = st.session_state.get('editing_round')
+    if editing is not None and editing[0] != key:
+        editing = st.session_state.editing_round = None
+    active = editing[1] if editing else st.session_state.current_round
+
+    # Pick up scores entered on other devices without discarding edits
+    # made here to anyone else's score.
+    st.session_state.night_version = (key, version)
+    seen = st.session_state.get('seen_scores')
+    if seen is None or seen[0] != key:
+        seen = st.session_state.seen_scores = (key, {})
+    if night.rounds:
+        for player, score in night.scores(night.round(active)).items():
+            widget = f"r{active}_{player}"
+            if widget not in st.session_state or seen[1].get(widget) != score:
+                st.session_state[widget] = seen[1][widget] = score
+
+    @st.fragment
+    def score_entry(record):
+        # Typing a score reruns only this fragment; submitting reruns the
+        # page so the leaderboards catch up.
+        number = record.number
+        matches = night.matches(record)
+        st.subheader(f"Round {number} Scores" + (" (editing)" if editing else ""))
+        if night.logged_rounds == len(night.rounds):
+            st.caption(f"Seed {round_seeds(night.log)[number - 1]}")
+        entered = {}
+        count('widgets.score_inputs', len(record.seats))
+        for court_name, match in matches:
+            with st.container():
+                st.markdown(f"### {court_name}")
+                minutes = court_info(court_entries.get(court_name, court_name))['match_minutes']
+                if format_type == "Timed" and minutes and number == st.session_state.current_round:
+                    st.caption(f"⏱ {minutes} minute matches on this court")
+                    render_timer(f"{clock_key}:{court_name}", size=36)
+                court_scores = {}
+                for player in match:
+                    court_scores[player] = st.number_input(f"{player} score", min_value=0,
+                                                           key=f"r{number}_{player}")
+                entered.update(court_scores)
+                if st.button(f"Submit {court_name}", key=f"submit-r{number}-{court_name}"):
+                    submit(record, [(court_name, match)], court_scores)
+                    st.session_state.score_message = ('success', f"Scores for {court_name} submitted.")
+                    st.rerun()
+
+        if st.button(f"Submit Scores for Round {number}"):
+            # Read at click time: a fragment rerun keeps the night from the
+            # last full run, and night_version is the version it was read at
+            shown = st.session_state.get('night_version')
+            shown_version = shown[1] if shown and shown[0] == key else -1
+            try:
+                if submit(record, matches, entered, shown_version):
+                    st.session_state.score_message = ('success', f"Scores for Round {number} submitted.")
+                else:
+                    st.session_state.score_message = ('info', f"Scores for Round {number} were already submitted.")
+            except VersionConflict:
+                st.session_state.score_message = ('warning', "This night was changed on another device. "
+                                                             "Check the latest scores and submit again.")
+            st.rerun()
+
+    message = st.session_state.pop('score_message', None)
+    if message:
+        getattr(st, message[0])(message[1])
+
+    if night.rounds:
+        with span('render.scores'):
+            score_entry(night.round(active))
+        if editing and st.button("Done Editing"):
+            st.session_state.editing_round = None
+            st.rerun()
+
+        others = [r for r in night.rounds if r.number != active]
+        if others:
+            with st.expander("Other Rounds"), span('render.other_rounds'):
+                count('widgets.round_summaries', len(others))
+                for record in others:
+                    st.markdown(round_summary(record.number, tuple(night.matches(record)), tuple(record.scores)))
+                col1, col2 = st.columns(2)
+                to_edit = col1.selectbox("Round to Edit", [r.number for r in others])
+                if col2.button("Edit Scores"):
+                    st.session_state.editing_round = (key, to_edit)
+                    st.rerun()
+
+    if night.rounds:
+        night_rounds = [(r.number, night.matches(r)) for r in night.rounds]
+        # Keyed on the night and what's in it, so a reset night with as
+        # many rounds doesn't offer the last one's file
+        export_key = (st.session_state.night_id, night_digest(night_rounds))
+        if st.button("Export Whole Night (PDF)"):
+            with span('export.night'):
+                st.session_state.night_export = (export_key, export_night(night_rounds, 'pdf'))
+        night_export = st.session_state.get('night_export')
+        if night_export and night_export[0] == export_key:
+            with open(night_export[1], 'rb') as f:
+                st.download_button("Download Night Schedule & Score Cards", data=f,
+                                   file_name=f"night_{st.session_state.night_id}.pdf")
 
     st.subheader("🎯 Nightly Leaderboard")
-    st.dataframe(st.session_state.nightly.sort_values("games", ascending=False))
+    with span('leaderboard.night'):
+        st.dataframe(stats.night_view(st.session_state.night_id, players))
 
     st.subheader("🏆 All-Time Leaderboard")
-    st.dataframe(st.session_state.all_time.sort_values("games", ascending=False))
+    sort_by = st.selectbox("Sort By", STAT_COLUMNS)
+    with span('leaderboard.all_time'):
+        all_time = stats.views()[sort_by]
+        st.dataframe(all_time)
+
+    breakdown_player = st.selectbox("Partners & Opponents", sorted(stats.partners), key="breakdown-player")
+    if breakdown_player:
+        with span('leaderboard.breakdown'):
+            st.dataframe(stats.breakdown(breakdown_player))
+
+    st.subheader("📈 Skill Ratings")
+    with span('leaderboard.ratings'):
+        st.dataframe(leaderboard({p: round(r) for p, r in ratings.snapshot().items()}, 'rating'))
+
+    st.subheader("📚 Club History")
+    with st.expander("Archived Nights"):
+        # Nights are archived on Reset Night; queries only read the columns
+        # and nights they need, so they stay quick however long the history
+        archive = get_archive()
+        season = st.date_input("Between", value=(date(date.today().year, 1, 1), date.today()),
+                               key="history-range")
+        if not season:
+            st.info("Pick a date range to search the archive.")
+        else:
+            since, until = (d.isoformat() for d in (season if len(season) == 2 else (season[0], season[0])))
+            col1, col2 = st.columns(2)
+            first = col1.selectbox("Player", sorted(players), key="h2h-first")
+            second = col2.selectbox("Against", sorted(players), key="h2h-second")
+            if st.button("Head-to-Head") and first and second:
+                with span('history.head_to_head'):
+                    st.dataframe(archive.head_to_head(first, second, since, until, club), hide_index=True)
+            if st.button("Attendance"):
+                with span('history.attendance'):
+                    per_night, per_player = archive.attendance(since, until, club)
+                st.dataframe(per_night, hide_index=True)
+                st.dataframe(leaderboard(per_player, 'nights'))
+            if st.button("Average Games by Court"):
+                with span('history.courts'):
+                    st.dataframe(archive.games_by_court(since, until, club), hide_index=True)
 
     if st.button("Export Leaderboard to CSV"):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"tennis_leaderboard_{timestamp}.csv"
-        st.session_state.all_time.to_csv(filename)
+        all_time.to_csv(filename)
         st.success(f"Exported to {filename}")
 
-    if st.button("Reset Night"):
-        st.session_state.nightly = pd.DataFrame(0, index=players, columns=['games'])
-        st.session_state.history = []
-        st.session_state.rounds = []
-        st.session_state.round_number = 1
-        st.session_state.player_roles = {p: [] for p in players}
+    def reset_night():
+        # The finished night goes to the archive before a new one starts
+        _, finished = nights.get(key)
+        get_archive().add_night(key, finished)
+        st.session_state.night_id = new_night_id()
+        st.session_state.current_round = 0
+
+    if st.button("Reset Night", on_click=reset_night):
         st.success("Nightly session reset.")
 
     with st.expander("⚠️ Danger Zone: All-Time Leaderboard"):
@@ -350,13 +471,15 @@ def app():
                 if st.button("✅ Yes, Delete"):
                     if os.path.exists(SCORE_FILE):
                         os.remove(SCORE_FILE)
-                    st.session_state.all_time = pd.DataFrame(columns=['games'])
-                    save_scores(st.session_state.all_time)
+                    ledger.clear()
+                    keep_scores(ledger, RatingBook(), PlayerStats())
                     st.success("All-Time Leaderboard has been deleted.")
                     st.session_state.confirm_delete = False
             with col2:
                 if st.button("❌ No, Keep"):
                     st.session_state.confirm_delete = False
 
+    admin_panel()
+
 if __name__ == '__main__':
-    app()
+    run_instrumented('main', app)
@@ -0,0 +1,55 @@
+from datetime import date
+
+import streamlit as st
+
+from utils.metrics import METRICS_LOG, Recorder, read_records, summarise
+
+# Hidden admin panel for the instrumentation in utils.metrics. Open either
+# app with ?admin=1 to see it. The switches belong to the session, so
+# timing one court-side tablet leaves every other device untouched.
+
+
+def run_instrumented(label, page):
+    # Runs page() under a Recorder when this session has timing switched on
+    if not st.session_state.get('metrics_on'):
+        return page()
+    recorder = Recorder(label, st.session_state.get('metrics_profile', False),
+                        st.session_state.get('metrics_memory', False))
+    try:
+        with recorder:
+            page()
+    finally:
+        # st.rerun() leaves page() by raising; keep what was measured
+        if recorder.record is not None:
+            st.session_state.last_metrics = recorder.record
+
+
+def admin_panel():
+    if 'admin' not in st.query_params:
+        return
+    with st.sidebar.expander("⚙️ Performance"):
+        st.checkbox("Record timings", key="metrics_on")
+        st.checkbox("Profile with cProfile", key="metrics_profile")
+        st.checkbox("Track memory with tracemalloc", key="metrics_memory")
+        st.caption(f"Each timed rerun is appended to {METRICS_LOG}.")
+
+        record = st.session_state.get('last_metrics')
+        if record:
+            peak = f", peak {record['peak_kb']:.0f} KB" if 'peak_kb' in record else ""
+            st.markdown(f"**Last rerun:** {record['total_ms']:.1f} ms at {record['time']}{peak}")
+            st.dataframe([{'span': '  ' * depth + name, 'start_ms': start, 'ms': ms}
+                          for name, depth, start, ms in record['spans']], hide_index=True)
+            if record['counters']:
+                st.dataframe([{'counter': name, 'count': n} for name, n in sorted(record['counters'].items())],
+                             hide_index=True)
+            if 'profile' in record:
+                st.code(record['profile'])
+
+        if st.button("Summarise Tonight"):
+            rows, counters = summarise(read_records(METRICS_LOG, since=date.today().isoformat()))
+            if rows:
+                st.dataframe(rows, hide_index=True)
+                st.dataframe([{'counter': name, 'total': n} for name, n in sorted(counters.items())],
+                             hide_index=True)
+            else:
+                st.info("No timed reruns logged today.")
@@ -0,0 +1,205 @@
+import os
+import threading
+from array import array
+from datetime import date
+
+from utils.cache import cached, file_version, shared
+from utils.persistence import load_data, save_data
+
+# Columnar archive of finished nights. The score ledger keeps each player's
+# games, but not who was on which court against whom, so "Reset Night"
+# files the night here first. Every seat of every scored round is one row,
+# stored column by column in flat files that are only ever appended to.
+# Nights are partitioned by the year of their date: one directory per year
+# holds the columns and an index of each night's key, date and row range,
+# and player and court names are interned once for the whole archive.
+#
+# Queries memory-map only the columns they read (numpy, imported on first
+# query) and only the partitions and row ranges of the nights asked for,
+# so years of club history answer in milliseconds without a DataFrame.
+
+ARCHIVE_DIR = os.environ.get('TENNIS_ARCHIVE_DIR', 'archive')
+
+# column -> array typecode; 'match' numbers the courts played within a
+# partition, and 'slot' is the seat on court (first half one team)
+COLUMNS = {'night': 'I', 'round': 'H', 'match': 'I', 'court': 'H', 'slot': 'B', 'size': 'B',
+           'player': 'I', 'games': 'H'}
+
+
+class NightArchive:
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.names_path = os.path.join(directory, 'names.json')
+
+    def _index_path(self, year):
+        return os.path.join(self.directory, str(year), 'nights.json')
+
+    def _names(self):
+        return cached(('archive.names', self.names_path), file_version(self.names_path),
+                      lambda: load_data(self.names_path) or {'players': [], 'courts': []})
+
+    def _index(self, year):
+        path = self._index_path(year)
+        return cached(('archive.index', path), file_version(path), lambda: tuple(load_data(path)))
+
+    def years(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if name.isdigit())
+
+    def add_night(self, key, night, day=None):
+        # Appends night's scored rounds (rounds left at 0-0 were never
+        # played) under key; returns the rows added, 0 if key is already
+        # archived for that year or nothing was scored.
+        day = day or date.today()
+        year = str(day.year)
+        with self.lock:
+            entries = list(self._index(year))
+            if any(entry['night'] == key for entry in entries):
+                return 0
+            names = self._names()
+            names = {'players': list(names['players']), 'courts': list(names['courts'])}
+            ids = {kind: {name: i for i, name in enumerate(names[kind])} for kind in names}
+
+            def intern(kind, name):
+                if name not in ids[kind]:
+                    ids[kind][name] = len(names[kind])
+                    names[kind].append(name)
+                return ids[kind][name]
+
+            start = entries[-1]['end'] if entries else 0
+            match = entries[-1]['matches'] if entries else 0
+            columns = {column: array(code) for column, code in COLUMNS.items()}
+            player_names = night.history.names
+            for record in night.rounds:
+                if not any(record.scores):
+                    continue
+                for court, first, last in record.groups():
+                    court_id = intern('courts', court)
+                    for slot in range(first, last):
+                        row = (len(entries), record.number, match, court_id, slot - first, last - first,
+                               intern('players', player_names[record.seats[slot]]), record.scores[slot])
+                        for values, value in zip(columns.values(), row):  # in COLUMNS order
+                            values.append(value)
+                    match += 1
+            rows = len(columns['night'])
+            if not rows:
+                return 0
+
+            # Names first and the index last: rows past the index's end (a
+            # write cut short) are cut off by the next append
+            save_data(self.names_path, names)
+            os.makedirs(os.path.join(self.directory, year), exist_ok=True)
+            for column, values in columns.items():
+                path = os.path.join(self.directory, year, column)
+                with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                    f.truncate(start * values.itemsize)
+                    f.seek(start * values.itemsize)
+                    values.tofile(f)
+            entries.append({'night': key, 'date': day.isoformat(), 'start': start, 'end': start + rows,
+                            'matches': match})
+            save_data(self._index_path(year), entries)
+            return rows
+
+    def _column(self, year, column):
+        import numpy as np
+        path = self._index_path(year)
+
+        def build():
+            entries = self._index(year)
+            rows = entries[-1]['end'] if entries else 0
+            if not rows:
+                return np.zeros(0, dtype=COLUMNS[column])
+            return np.memmap(os.path.join(self.directory, year, column), dtype=COLUMNS[column], mode='r',
+                             shape=(rows,))
+        return cached(('archive.column', path, column), file_version(path), build)
+
+    def _scan(self, columns, since=None, until=None, club=None):
+        # Yields (year, nights, {column: values}) for every partition with
+        # nights in range, nights as (position in partition, index entry);
+        # since/until are ISO dates, club a night key prefix
+        import numpy as np
+        for year in self.years():
+            if (since and year < since[:4]) or (until and year > until[:4]):
+                continue
+            entries = self._index(year)
+            nights = [(i, e) for i, e in enumerate(entries)
+                      if (not since or e['date'] >= since) and (not until or e['date'] <= until)
+                      and (club is None or e['night'].startswith(f"{club}:"))]
+            if not nights:
+                continue
+            ranges = []
+            for _, e in nights:
+                if ranges and ranges[-1][1] == e['start']:
+                    ranges[-1][1] = e['end']
+                else:
+                    ranges.append([e['start'], e['end']])
+            values = {}
+            for column in columns:
+                data = self._column(year, column)
+                values[column] = (data[ranges[0][0]:ranges[0][1]] if len(ranges) == 1
+                                  else np.concatenate([data[a:b] for a, b in ranges]))
+            yield year, nights, values
+
+    def head_to_head(self, a, b, since=None, until=None, club=None):
+        # One row each for a and b: courts where they were on opposite
+        # teams, wins and games. Each compares their own games (doubles
+        # pairs are entered with their team's); American groups have no
+        # teams and are left out.
+        import numpy as np
+        ids = {name: i for i, name in enumerate(self._names()['players'])}
+        played = wins_a = wins_b = games_a = games_b = 0
+        if a in ids and b in ids:
+            for _, _, c in self._scan(('player', 'match', 'slot', 'size', 'games'), since, until, club):
+                ia = np.flatnonzero(c['player'] == ids[a])
+                ib = np.flatnonzero(c['player'] == ids[b])
+                _, xa, xb = np.intersect1d(c['match'][ia], c['match'][ib], assume_unique=True,
+                                           return_indices=True)
+                ia, ib = ia[xa], ib[xb]
+                half = c['size'][ia] // 2
+                keep = (c['size'][ia] != 3) & ((c['slot'][ia] < half) != (c['slot'][ib] < half))
+                ga = c['games'][ia][keep].astype(np.int64)
+                gb = c['games'][ib][keep].astype(np.int64)
+                played += int(keep.sum())
+                wins_a += int((ga > gb).sum())
+                wins_b += int((gb > ga).sum())
+                games_a += int(ga.sum())
+                games_b += int(gb.sum())
+        return [{'player': a, 'matches': played, 'wins': wins_a, 'games': games_a},
+                {'player': b, 'matches': played, 'wins': wins_b, 'games': games_b}]
+
+    def attendance(self, since=None, until=None, club=None):
+        # (one row per night with its date and players there, {player: nights})
+        import numpy as np
+        players = self._names()['players']
+        per_night = []
+        totals = np.zeros(len(players), dtype=np.int64)
+        for _, nights, c in self._scan(('night', 'player'), since, until, club):
+            # Each (night, player) once, from one unique over packed pairs
+            seen = np.unique((c['night'].astype(np.int64) << 32) | c['player'])
+            there = np.bincount(seen >> 32, minlength=nights[-1][0] + 1)
+            totals += np.bincount(seen & 0xFFFFFFFF, minlength=len(players))
+            per_night.extend({'date': e['date'], 'night': e['night'], 'players': int(there[i])} for i, e in nights)
+        return per_night, {players[i]: int(totals[i]) for i in np.flatnonzero(totals)}
+
+    def games_by_court(self, since=None, until=None, club=None):
+        # Average games per seat on each court, busiest court first
+        import numpy as np
+        courts = self._names()['courts']
+        games = np.zeros(len(courts))
+        seats = np.zeros(len(courts), dtype=np.int64)
+        for _, _, c in self._scan(('court', 'games'), since, until, club):
+            games += np.bincount(c['court'], weights=c['games'], minlength=len(courts))
+            seats += np.bincount(c['court'], minlength=len(courts))
+        rows = [{'court': courts[i], 'seats': int(seats[i]), 'average_games': float(games[i] / seats[i])}
+                for i in np.flatnonzero(seats)]
+        rows.sort(key=lambda row: -row['seats'])
+        return rows
+
+
+def get_archive(directory=None):
+    # One archive per directory
+    if directory is None:
+        directory = ARCHIVE_DIR
+    return shared(('archive', directory), lambda: NightArchive(directory))
@@ -0,0 +1,139 @@
+# Court metadata and constraints. A court is stored either as a bare name
+# (the old courts.json format) or as a dict of attributes, and court_info()
+# turns both into the full record. What a court can host is precomputed
+# into a bitmask and each match asks for a mask of its own, so checking a
+# court against a match is a single AND.
+
+SURFACES = ['hard', 'clay', 'grass', 'carpet']
+
+SINGLES = 1
+DOUBLES = 2  # also American doubles groups of three
+LIT = 4
+SURFACE_BITS = {surface: 8 << i for i, surface in enumerate(SURFACES)}
+
+DEFAULTS = {'surface': 'hard', 'lit': True, 'windows': [], 'singles_only': False, 'match_minutes': None}
+
+
+def court_name(entry):
+    return entry if isinstance(entry, str) else str(entry['name'])
+
+
+def court_info(entry):
+    info = {'name': court_name(entry)}
+    if not isinstance(entry, str):
+        info.update((k, v) for k, v in entry.items() if k != 'name')
+    for key, value in DEFAULTS.items():
+        info.setdefault(key, list(value) if isinstance(value, list) else value)
+    return info
+
+
+def compact_court(info):
+    # Only what differs from the defaults; a default court stays a bare name
+    extra = {k: v for k, v in info.items() if k != 'name' and DEFAULTS.get(k) != v}
+    return {'name': info['name'], **extra} if extra else info['name']
+
+
+def clock_minutes(text):
+    hours, minutes = text.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_windows(text):
+    # "18:00-20:00, 21:00-22:30" -> [["18:00", "20:00"], ["21:00", "22:30"]];
+    # an open end ("19:30-" or "-21:00") runs from or to midnight.
+    windows = []
+    for part in text.split(','):
+        if part.strip():
+            start, end = (t.strip() for t in part.split('-'))
+            start, end = start or '00:00', end or '24:00'
+            clock_minutes(start), clock_minutes(end)  # validates
+            windows.append([start, end])
+    return windows
+
+
+def court_mask(info):
+    mask = SINGLES | SURFACE_BITS.get(info['surface'], 0)
+    if not info['singles_only']:
+        mask |= DOUBLES
+    if info['lit']:
+        mask |= LIT
+    return mask
+
+
+def group_need(group):
+    return SINGLES if len(group) == 2 else DOUBLES
+
+
+def in_windows(windows, at):
+    # at: minutes since midnight, or None to ignore availability windows
+    return at is None or not windows or any(clock_minutes(a) <= at < clock_minutes(b) for a, b in windows)
+
+
+def is_open(info, at):
+    return in_windows(info['windows'], at)
+
+
+def open_courts(courts, at=None, dusk=None, surface=None):
+    # Court records that can be used at `at`: inside an availability
+    # window, lit once it's past dusk, and of the requested surface.
+    need = 0
+    if at is not None and dusk is not None and at >= dusk:
+        need |= LIT
+    if surface is not None:
+        need |= SURFACE_BITS[surface]
+    infos = [court_info(c) for c in courts]
+    return [i for i in infos if court_mask(i) & need == need and is_open(i, at)]
+
+
+def court_counts(infos, match_type='Singles'):
+    # (courts for the night's main match type, extra singles-only courts)
+    if match_type == 'Singles':
+        return len(infos), 0
+    doubles = sum(1 for i in infos if court_mask(i) & DOUBLES)
+    return doubles, len(infos) - doubles
+
+
+def assign_courts(groups, infos):
+    # Groups needing doubles courts go first; each takes the free court
+    # with the fewest capabilities it doesn't need, so singles matches
+    # fill singles-only courts before flexible ones. Returns the placed
+    # (court name, group) pairs in court order, and any groups left over.
+    masks = [court_mask(i) for i in infos]
+    free = list(range(len(infos)))
+    placed = {}
+    unplaced = []
+    for group in sorted(groups, key=lambda g: group_need(g) != DOUBLES):
+        need = group_need(group)
+        fits = [c for c in free if masks[c] & need == need]
+        if not fits:
+            unplaced.append(group)
+            continue
+        best = min(fits, key=lambda c: bin(masks[c] & ~need).count('1'))
+        free.remove(best)
+        placed[best] = group
+    return [(infos[c]['name'], placed[c]) for c in sorted(placed)], unplaced
+
+
+def assign_in_order(groups, infos):
+    # For ranked groups (a ladder, top court first): each group in turn
+    # takes the first free court listed that fits it, unless that would
+    # leave too few doubles courts for the groups still to come. Returns
+    # the same as assign_courts.
+    masks = [court_mask(i) for i in infos]
+    free = list(range(len(infos)))
+    doubles_left = sum(1 for g in groups if group_need(g) == DOUBLES)
+    placed = {}
+    unplaced = []
+    for group in groups:
+        need = group_need(group)
+        if need == DOUBLES:
+            doubles_left -= 1
+        spare = sum(1 for c in free if masks[c] & DOUBLES) - doubles_left
+        fits = [c for c in free if masks[c] & need == need
+                and (need == DOUBLES or spare > 0 or not masks[c] & DOUBLES)]
+        if not fits:
+            unplaced.append(group)
+            continue
+        free.remove(fits[0])
+        placed[fits[0]] = group
+    return [(infos[c]['name'], placed[c]) for c in sorted(placed)], unplaced
@@ -0,0 +1,83 @@
+import random
+from functools import lru_cache
+
+# Constructive singles schedules, so no search is needed while a design
+# fits. The circle method (Berger tables) gives n players n - 1 rounds in
+# which every pair meets exactly once; an odd roster adds a bye, who rests.
+# That is a true round robin, which the search can't promise once most
+# pairs have met. Doubles have no such table here (a partner design still
+# repeats opponents far more than the search does), so they are searched.
+#
+# Tables are cheap to build (a few milliseconds at 300 players) and kept in
+# memory per roster size. A night maps a table onto its roster through a
+# player order drawn when the design starts, and keeps that order and the
+# next row in a small dict stored with its rotation. A row is only used if
+# none of its pairs has met more often than the design itself had them
+# meet, so pairings from before the design started (a roster change
+# restarts it) or from searched rounds in between aren't repeated; the
+# round is searched instead.
+
+
+def berger_rounds(n):
+    # n even. Player n - 1 stays put while the others turn one place a round.
+    ring = list(range(n - 1))
+    rounds = []
+    for r in range(n - 1):
+        turned = ring[r:] + ring[:r]
+        pairs = [[n - 1, turned[0]]] if r % 2 else [[turned[0], n - 1]]
+        pairs += [[turned[i], turned[n - 1 - i]] for i in range(1, n // 2)]
+        rounds.append(pairs)
+    return rounds
+
+
+@lru_cache(maxsize=64)
+def design_table(n):
+    # Rows of index pairs for n players (n even), built on first use
+    return tuple(tuple(tuple(pair) for pair in row) for row in berger_rounds(n))
+
+
+@lru_cache(maxsize=64)
+def design_meetings(n):
+    # (i, j) with i < j -> the table row that pairs them
+    return {(min(a, b), max(a, b)): number for number, row in enumerate(design_table(n)) for a, b in row}
+
+
+def design_round(state, players, court_count, match_type='Singles', allow_american=False, rng=None,
+                 times_met=None):
+    # (groups, resting) for the next round from a round robin, or None when
+    # none fits: doubles, too few courts, an odd roster that should play
+    # American doubles, or (with times_met, the night's
+    # PairHistory.times_met) a row that would repeat a pairing the design
+    # didn't make. state: the night's design dict; restarted whenever the
+    # roster changes, and left on the same row when a row is turned down.
+    n = len(players)
+    if match_type != 'Singles' or n < 2 or (n % 2 and allow_american) or court_count < n // 2:
+        return None
+
+    if state.get('kind') != 'singles' or set(state.get('players', ())) != set(players):
+        order = list(players)
+        (rng or random).shuffle(order)
+        state.clear()
+        state.update(kind='singles', players=order, row=0)
+    order = state['players']
+    size = n + n % 2
+    rows = design_table(size)
+    number = state['row']
+    cycles, at = divmod(number, len(rows))
+    row = rows[at]
+    if times_met is not None:
+        meetings = design_meetings(size)
+        for a, b in row:
+            if max(a, b) < n and times_met(order[a], order[b]) > cycles + (meetings[min(a, b), max(a, b)] < at):
+                return None
+    state['row'] += 1
+
+    groups, resting = [], []
+    for a, b in row:
+        if b == n:
+            resting.append(order[a])
+        elif a == n:
+            resting.append(order[b])
+        else:
+            groups.append((order[a], order[b]))
+    return groups, resting
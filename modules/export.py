@@ -0,0 +1,143 @@
+import csv
+import hashlib
+import io
+import json
+import os
+from functools import lru_cache
+from io import BytesIO
+
+# Schedule exports. Nothing is rendered until a download is asked for.
+# Single rounds are memoised on their content; whole-night files are built in
+# one pass straight to disk under a content hash and served from there.
+
+EXPORT_DIR = "exports"
+
+
+def freeze_matches(matches):
+    return tuple((str(court), tuple(players)) for court, players in matches)
+
+
+def generate_pdf(matches, round_num):
+    return BytesIO(round_pdf(freeze_matches(matches), round_num))
+
+
+def generate_csv(matches):
+    return BytesIO(round_csv(freeze_matches(matches)))
+
+
+@lru_cache(maxsize=128)
+def round_pdf(matches, round_num):
+    buffer = BytesIO()
+    pdf = PdfWriter(buffer)
+    pdf.heading(f"Tennis Schedule - Round {round_num}")
+    for court, players in matches:
+        pdf.line(f"Court {court}: {' vs. '.join(players)}")
+    pdf.save()
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=128)
+def round_csv(matches):
+    text = io.StringIO()
+    writer = csv.writer(text, lineterminator='\n')
+    writer.writerow(["Court", "Players"])
+    for court, players in matches:
+        writer.writerow([court, ', '.join(players)])
+    return text.getvalue().encode()
+
+
+def night_digest(rounds):
+    payload = json.dumps([[number, matches] for number, matches in rounds])
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def export_night(rounds, kind='pdf', directory=EXPORT_DIR):
+    # rounds: [(round number, [(court, players), ...]), ...]
+    rounds = [(number, freeze_matches(matches)) for number, matches in rounds]
+    path = os.path.join(directory, f"night_{night_digest(rounds)}.{kind}")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        if kind == 'pdf':
+            write_night_pdf(rounds, tmp_path)
+        else:
+            write_night_csv(rounds, tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def write_night_csv(rounds, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(["Round", "Court", "Players"])
+        for number, matches in rounds:
+            for court, players in matches:
+                writer.writerow([number, court, ', '.join(players)])
+
+
+def write_night_pdf(rounds, path):
+    pdf = PdfWriter(path)
+    by_court = {}
+
+    # Schedule, one block per round
+    pdf.heading("Tennis Schedule - Full Night")
+    for number, matches in rounds:
+        pdf.subheading(f"Round {number}")
+        for court, players in matches:
+            pdf.line(f"Court {court}: {' vs. '.join(players)}")
+            by_court.setdefault(court, []).append((number, players))
+
+    # Court sheets, one page per court
+    for court, games in by_court.items():
+        pdf.page()
+        pdf.heading(f"Court {court}")
+        for number, players in games:
+            pdf.line(f"Round {number}: {' vs. '.join(players)}")
+
+    # Score cards, one page per round with a box per court
+    for number, matches in rounds:
+        pdf.page()
+        pdf.heading(f"Score Cards - Round {number}")
+        for court, players in matches:
+            pdf.subheading(f"Court {court}")
+            for player in players:
+                pdf.line(f"{player}:  ________ games")
+    pdf.save()
+
+
+class PdfWriter:
+    # Thin wrapper over a reportlab canvas that handles line spacing and
+    # page breaks. reportlab is only imported once something is rendered.
+    def __init__(self, target):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+        self.canvas = canvas.Canvas(target, pagesize=letter)
+        self.width, self.height = letter
+        self.y = self.height - 50
+
+    def _advance(self, step):
+        self.y -= step
+        if self.y < 50:
+            self.page()
+
+    def page(self):
+        self.canvas.showPage()
+        self.y = self.height - 50
+
+    def heading(self, text):
+        self.canvas.setFont("Helvetica-Bold", 16)
+        self.canvas.drawString(100, self.y, text)
+        self._advance(30)
+
+    def subheading(self, text):
+        self.canvas.setFont("Helvetica-Bold", 13)
+        self.canvas.drawString(50, self.y, text)
+        self._advance(20)
+
+    def line(self, text):
+        self.canvas.setFont("Helvetica", 12)
+        self.canvas.drawString(50, self.y, text)
+        self._advance(20)
+
+    def save(self):
+        self.canvas.save()
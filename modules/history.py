@@ -0,0 +1,81 @@
+from array import array
+
+# Who-has-met-whom store. Players are interned to integer ids and the counts
+# live in one flat, symmetric array, so lookups are a single index and the
+# whole thing pickles (or serialises to JSON) without any lambdas inside.
+
+COUNT_SIZE = array('I').itemsize
+
+
+class PairHistory:
+    def __init__(self, players=()):
+        self.ids = {}
+        self.names = []
+        self.capacity = 0
+        self.counts = array('I')
+        for p in players:
+            self.intern(p)
+
+    def intern(self, player):
+        pid = self.ids.get(player)
+        if pid is None:
+            pid = len(self.names)
+            self.ids[player] = pid
+            self.names.append(player)
+            if pid >= self.capacity:
+                self._grow(max(16, self.capacity * 2))
+        return pid
+
+    def _grow(self, capacity):
+        old, old_capacity = self.counts, self.capacity
+        counts = array('I', bytes(COUNT_SIZE * capacity * capacity))
+        for i in range(old_capacity):
+            start = i * capacity
+            counts[start:start + old_capacity] = old[i * old_capacity:(i + 1) * old_capacity]
+        self.counts = counts
+        self.capacity = capacity
+
+    def times_met(self, a, b):
+        ia = self.ids.get(a)
+        ib = self.ids.get(b)
+        if ia is None or ib is None:
+            return 0
+        return self.counts[ia * self.capacity + ib]
+
+    def already_played(self, a, b):
+        return self.times_met(a, b) > 0
+
+    def record_round(self, matches, count=1):
+        # Intern first so the matrix is grown at most once, then bump every
+        # cell the round touches in a single pass. count=-1 forgets a round.
+        groups = [[self.intern(p) for p in match] for match in matches]
+        capacity = self.capacity
+        cells = []
+        for ids in groups:
+            for i in range(len(ids)):
+                for j in range(i + 1, len(ids)):
+                    cells.append(ids[i] * capacity + ids[j])
+                    cells.append(ids[j] * capacity + ids[i])
+        counts = self.counts
+        for cell in cells:
+            counts[cell] += count
+
+    def to_dict(self):
+        n = len(self.names)
+        pairs = []
+        for i in range(n):
+            row = i * self.capacity
+            for j in range(i + 1, n):
+                met = self.counts[row + j]
+                if met:
+                    pairs.append([i, j, met])
+        return {'players': list(self.names), 'pairs': pairs}
+
+    @classmethod
+    def from_dict(cls, data):
+        history = cls(data.get('players', []))
+        capacity = history.capacity
+        for i, j, met in data.get('pairs', []):
+            history.counts[i * capacity + j] = met
+            history.counts[j * capacity + i] = met
+        return history
@@ -0,0 +1,85 @@
+import random
+
+# King-of-the-court ladder. Courts are ranked top to bottom in the order
+# they're dealt (the first court listed is the top court), and after each
+# round the winners on a court move up one and the losers down one; the top
+# court's winners and the bottom court's losers stay, as does everyone on a
+# drawn court and the middle player of an American group. The ladder is a
+# dict of player -> court index they're due on, kept in ladder order, so
+# the next round is a single pass over the players: drop each into the
+# bucket for their court, then deal the buckets onto courts top down.
+# Nothing is sorted beyond the players of one court, so a round is
+# O(players) however long the night runs.
+
+
+def ladder_moves(matches, scores):
+    # (up, down) from a round's (court, players) and player -> games. Within
+    # a court the best moves up and the worst down if the best beat them,
+    # then the second best and second worst, and so on.
+    up, down = [], []
+    for _, match in matches:
+        ranked = sorted(match, key=lambda p: -scores.get(p, 0))
+        for i in range(len(ranked) // 2):
+            high, low = ranked[i], ranked[-1 - i]
+            if scores.get(high, 0) > scores.get(low, 0):
+                up.append(high)
+                down.append(low)
+    return up, down
+
+
+def apply_moves(ladder, up=(), down=()):
+    for p in up:
+        if p in ladder:
+            ladder[p] = max(ladder[p] - 1, 0)
+    for p in down:
+        if p in ladder:
+            ladder[p] += 1  # kept on the bottom court when dealt
+
+
+def ladder_round(ladder, players, shape, resting=(), ratings=None, rng=None):
+    # Groups for the next round, top court first, in the shape given by
+    # modules.planner.round_shape: full courts, then a singles match, then
+    # an American group, so odd numbers are made up at the bottom. Arrivals
+    # start on the bottom court (strongest first with ratings, otherwise in
+    # a random order); players away keep their place for when they return.
+    courts = shape['matches'] + shape['singles'] + (1 if shape['american'] else 0)
+    bottom = max(courts - 1, 0)
+    here = set(players)
+    sitting_out = set(resting)
+
+    buckets = [[] for _ in range(bottom + 1)]
+    for p, court in ladder.items():
+        if p in here and p not in sitting_out:
+            buckets[min(court, bottom)].append(p)
+    arrivals = [p for p in players if p not in ladder]
+    if ratings:
+        arrivals.sort(key=lambda p: -ratings.get(p, 0))
+    else:
+        (rng or random).shuffle(arrivals)
+    for p in arrivals:
+        ladder[p] = bottom
+        if p not in sitting_out:
+            buckets[bottom].append(p)
+    order = [p for bucket in buckets for p in bucket]
+
+    sizes = [shape['step']] * shape['matches'] + [2] * shape['singles']
+    if shape['american']:
+        sizes.append(shape['american'])
+    groups, dealt, start = [], {}, 0
+    for court, size in enumerate(sizes):
+        group = order[start:start + size]
+        start += size
+        if size == 4:
+            # Pairs arrive together from the courts above and below; split
+            # them so each team has one of each
+            group = [group[0], group[2], group[1], group[3]]
+        for p in group:
+            dealt[p] = court
+        groups.append(tuple(group))
+
+    # Back in ladder order, with those sitting out or away where they were
+    for p, court in ladder.items():
+        dealt.setdefault(p, court)
+    ladder.clear()
+    ladder.update(dealt)
+    return groups
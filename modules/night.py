@@ -0,0 +1,131 @@
+import zlib
+from array import array
+
+from modules.history import PairHistory
+from modules.rotation import Rotation
+
+# Compact record of one night. Player names are interned once, by the
+# night's PairHistory, and each round stores only court names, group sizes
+# and player ids, with the scores in a preallocated array alongside, so a
+# long night copies and serialises in a handful of flat arrays. Players
+# arriving late or leaving early have availability windows kept with the
+# night, so every device schedules from the same roster.
+#
+# Rounds scheduled through modules.replay are also logged as seeded steps.
+# The round records stay the saved truth; the log travels with them so any
+# round can be drawn again (modules.replay.regenerate), since a replay only
+# matches while the scheduler itself is unchanged.
+
+
+class RoundRecord:
+    __slots__ = ('number', 'courts', 'sizes', 'seats', 'scores')
+
+    def __init__(self, number, courts, sizes, seats, scores=None):
+        self.number = number
+        self.courts = tuple(courts)
+        self.sizes = array('B', sizes)
+        self.seats = array('I', seats)
+        self.scores = array('I', scores) if scores is not None else array('I', bytes(4 * len(self.seats)))
+
+    def groups(self):
+        # (court, start, end) for each court's slice of seats and scores
+        start = 0
+        for court, size in zip(self.courts, self.sizes):
+            yield court, start, start + size
+            start += size
+
+    def to_dict(self):
+        return {'round': self.number, 'courts': list(self.courts), 'sizes': list(self.sizes),
+                'seats': list(self.seats), 'scores': list(self.scores)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['round'], data['courts'], data['sizes'], data['seats'], data['scores'])
+
+
+class Night:
+    __slots__ = ('history', 'rotation', 'rounds', 'round_number', 'availability', 'roster', 'log',
+                 'logged_rounds')
+
+    def __init__(self, history=None, rotation=None):
+        self.history = history if history is not None else PairHistory()
+        self.rotation = rotation if rotation is not None else Rotation()
+        self.rounds = []
+        self.round_number = 1
+        self.availability = {}  # player -> [[start, end], ...]
+        self.roster = []  # players as of the last logged step, in join order
+        self.log = []  # seeded steps, see modules.replay
+        self.logged_rounds = 0
+
+    def set_availability(self, player, windows):
+        if windows:
+            self.availability[player] = windows
+        else:
+            self.availability.pop(player, None)
+
+    def add_round(self, matches):
+        # matches: [(court, players)]; pairings are recorded by the scheduler
+        intern = self.history.intern
+        record = RoundRecord(self.round_number, [court for court, _ in matches],
+                             [len(match) for _, match in matches],
+                             [intern(p) for _, match in matches for p in match])
+        self.rounds.append(record)
+        self.round_number += 1
+        return record
+
+    def round(self, number):
+        return self.rounds[number - 1]
+
+    def matches(self, record):
+        names = self.history.names
+        return [(court, tuple(names[i] for i in record.seats[start:end])) for court, start, end in record.groups()]
+
+    def scores(self, record):
+        names = self.history.names
+        return {names[i]: score for i, score in zip(record.seats, record.scores)}
+
+    def set_scores(self, record, scores):
+        names = self.history.names
+        for slot, pid in enumerate(record.seats):
+            score = scores.get(names[pid])
+            if score is not None:
+                record.scores[slot] = score
+
+    def digest(self):
+        # Fingerprint of where everyone sat, round by round
+        crc = 0
+        for record in self.rounds:
+            crc = zlib.crc32(record.sizes.tobytes() + record.seats.tobytes(), crc)
+        return crc
+
+    def adopt(self, data):
+        # Takes a scheduling step run elsewhere (modules.service) on a copy
+        # of this night, given as its to_dict(): the new
+        # rounds, pairing history, rotation and log. Rounds already here
+        # keep their scores, which may have been entered meanwhile.
+        done = Night.from_dict(data)
+        self.history = done.history
+        self.rotation = done.rotation
+        self.roster = done.roster
+        self.log = done.log
+        self.logged_rounds = done.logged_rounds
+        self.rounds.extend(done.rounds[len(self.rounds):])
+        self.round_number = done.round_number
+
+    def to_dict(self):
+        return {'history': self.history.to_dict(), 'rotation': self.rotation.to_dict(),
+                'round_number': self.round_number, 'rounds': [r.to_dict() for r in self.rounds],
+                'availability': self.availability, 'roster': self.roster, 'log': self.log,
+                'logged_rounds': self.logged_rounds}
+
+    @classmethod
+    def from_dict(cls, data):
+        rounds = data.get('rounds', [])
+        night = cls(PairHistory.from_dict(data.get('history', {})), Rotation.from_dict(data.get('rotation', {})))
+        night.round_number = data.get('round_number', 1)
+        night.rounds = [RoundRecord.from_dict(r) for r in rounds]
+        night.availability = data.get('availability', {})
+        night.roster = list(data.get('roster', []))
+        night.log = list(data.get('log', []))
+        night.logged_rounds = data.get('logged_rounds', 0)
+        return night
@@ -0,0 +1,123 @@
+import random
+import time
+
+# Pairing engine: splits players into court-sized groups so that people who
+# have already met are kept apart. Local search over a pair-cost matrix with
+# a wall-clock budget, so a 100 player doubles round stays well under 50 ms.
+# Given an rng (random.Random), the search draws only from it and stops
+# after a fixed number of moves instead, so the same seed always gives the
+# same groups on any machine.
+
+DEFAULT_TIME_BUDGET = 0.04  # seconds
+CHECK_EVERY = 128  # iterations between clock checks
+STALL_FACTOR = 50  # give up after this many idle moves per player
+MOVES_PER_SECOND = 250000  # turns a time budget into a move budget for seeded runs
+REPEAT_WEIGHT = 100  # one repeat outweighs a 1000 point rating gap
+RATING_SCALE = 100.0  # rating points per unit of skill cost
+
+
+def group_players(players, size, times_met, time_budget=DEFAULT_TIME_BUDGET, ratings=None, rng=None):
+    # ratings, when given, maps player -> skill rating: courts then group
+    # similar ratings and foursomes are split into the most even teams.
+    if rng is None:
+        rng, deadline, move_limit = random, time.perf_counter() + time_budget, None
+    else:
+        deadline, move_limit = None, int(time_budget * MOVES_PER_SECOND)
+    n = len(players) - len(players) % size
+    if n == 0:
+        return []
+
+    # Squared so that meeting one person three times costs more than
+    # meeting three people twice.
+    repeats = [[0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            met = times_met(players[i], players[j])
+            if met:
+                repeats[i][j] = repeats[j][i] = met * met
+
+    skill = None
+    cost = repeats
+    if ratings is not None:
+        from modules.ratings import DEFAULT_RATING
+        skill = [ratings.get(p, DEFAULT_RATING) / RATING_SCALE for p in players[:n]]
+        cost = [[REPEAT_WEIGHT * repeats[i][j] + (skill[i] - skill[j]) ** 2 if i != j else 0
+                 for j in range(n)] for i in range(n)]
+
+    groups = [list(range(k, k + size)) for k in range(0, n, size)]
+    if len(groups) > 1:
+        improve_groups(groups, cost, deadline, rng, move_limit)
+
+    result = []
+    for group in groups:
+        if size == 4:
+            group = best_split(group, repeats, skill)
+        result.append(tuple(players[i] for i in group))
+    return result
+
+
+def group_cost(group, cost):
+    total = 0
+    for i in range(len(group)):
+        row = cost[group[i]]
+        for j in range(i + 1, len(group)):
+            total += row[group[j]]
+    return total
+
+
+def improve_groups(groups, cost, deadline, rng=random, move_limit=None):
+    costs = [group_cost(g, cost) for g in groups]
+    total = sum(costs)
+    count = len(groups)
+    size = len(groups[0])
+    stall_limit = STALL_FACTOR * count * size
+    iterations = 0
+    last_gain = 0
+
+    while total > 0:
+        iterations += 1
+        if iterations % CHECK_EVERY == 0:
+            if iterations - last_gain > stall_limit:
+                break
+            if deadline is None:
+                if iterations >= move_limit:
+                    break
+            elif time.perf_counter() > deadline:
+                break
+
+        a = rng.randrange(count)
+        if costs[a] == 0:
+            continue
+        b = rng.randrange(count - 1)
+        if b >= a:
+            b += 1
+        ga, gb = groups[a], groups[b]
+        i = rng.randrange(size)
+        j = rng.randrange(size)
+        x, y = ga[i], gb[j]
+        cx, cy = cost[x], cost[y]
+
+        delta_a = sum(cy[p] - cx[p] for p in ga if p != x)
+        delta_b = sum(cx[q] - cy[q] for q in gb if q != y)
+        # Sideways moves are accepted too, to walk across plateaus.
+        if delta_a + delta_b <= 0:
+            if delta_a + delta_b < 0:
+                last_gain = iterations
+            ga[i], gb[j] = y, x
+            costs[a] += delta_a
+            costs[b] += delta_b
+            total += delta_a + delta_b
+
+
+def best_split(group, cost, skill=None):
+    a, b, c, d = group
+    # Teams are (first two) vs (last two); keep repeat partners apart and,
+    # with ratings, make the two teams' combined skill as even as possible.
+    splits = [(a, b, c, d), (a, c, b, d), (a, d, b, c)]
+
+    def split_cost(s):
+        total = REPEAT_WEIGHT * (cost[s[0]][s[1]] + cost[s[2]][s[3]])
+        if skill is not None:
+            total += (skill[s[0]] + skill[s[1]] - skill[s[2]] - skill[s[3]]) ** 2
+        return total
+    return min(splits, key=split_cost)
@@ -0,0 +1,122 @@
+import random
+
+from modules.courts import assign_courts, court_counts, in_windows, open_courts
+from modules.designs import design_round
+from modules.history import PairHistory
+from modules.pairing import DEFAULT_TIME_BUDGET, group_players
+from modules.rotation import Rotation
+
+# Whole-night planner: builds every round up front in one pass, so rests and
+# American doubles turns are spread over the night as a whole instead of
+# being decided one click at a time.
+
+
+def present_players(players, availability, at):
+    # availability: player -> windows (see modules.courts); players with no
+    # windows are there all night.
+    if not availability or at is None:
+        return list(players)
+    return [p for p in players if in_windows(availability.get(p), at)]
+
+
+def round_shape(player_count, court_count, match_type='Singles', allow_american=False, singles_courts=0):
+    # singles_courts: extra courts that can only take a singles match
+    step = 2 if match_type == 'Singles' else 4
+    full = min(court_count, player_count // step)
+    leftover = player_count - full * step
+    spare_court = full < court_count
+    spare_singles = spare_court or singles_courts > 0
+    shape = {'step': step, 'matches': full, 'singles': 0, 'american': 0, 'rest': 0}
+
+    if allow_american and spare_singles and leftover == 1 and step == 4 and full > 0:
+        # One doubles court becomes a singles match plus an American group
+        shape['matches'] -= 1
+        shape['singles'] = 1
+        shape['american'] = 3
+    elif allow_american and spare_singles and leftover == 2:
+        shape['singles'] = 1
+    elif allow_american and spare_court and leftover == 3:
+        shape['american'] = 3
+    else:
+        shape['rest'] = leftover
+    return shape
+
+
+def plan_night(players, courts, rounds, match_type='Singles', allow_american=False,
+               history=None, time_budget=DEFAULT_TIME_BUDGET, ratings=None, rotation=None,
+               start=None, round_minutes=None, dusk=None, availability=None, rng=None):
+    # courts may be names or court records (see modules.courts). With a
+    # start time (minutes since midnight) and round length, each round only
+    # uses the courts open at its own start, and only the players there
+    # then according to availability. With an rng every draw comes from it,
+    # so the same seed plans the same night.
+    roster = list(players)
+    courts = list(courts)
+    if history is None:
+        history = PairHistory(roster)
+    if rotation is None:
+        rotation = Rotation(roster, rng)
+
+    # Rests and American turns come from the rotation, so nobody sits out
+    # twice before everyone has sat out once, counting earlier rounds too.
+    plan = []
+    for number in range(rounds):
+        at = start + number * round_minutes if start is not None else None
+        players = present_players(roster, availability, at)
+        infos = open_courts(courts, at, dusk)
+        court_count, singles_courts = court_counts(infos, match_type)
+
+        # Rounds a singles round robin covers are taken as they are (and left
+        # alone by the second sweep)
+        designed = None
+        if ratings is None:
+            designed = design_round(rotation.design, players, court_count, match_type, allow_american, rng,
+                                    history.times_met)
+        if designed is not None:
+            groups, resting = designed
+            rotation.set_active(players, rng)
+            rotation.record_round(resting, (), rng)
+            history.record_round(groups)
+            plan.append({'round': number + 1, 'groups': groups, 'resting': resting, 'american': [],
+                         'regular': 0, 'courts': infos})
+            continue
+
+        shape = round_shape(len(players), court_count, match_type, allow_american, singles_courts)
+        step = shape['step']
+        regular = shape['matches']
+
+        resting = rotation.pick_resting(players, shape['rest'], rng)
+        sitting_out = set(resting)
+        pool = [p for p in players if p not in sitting_out]
+        (rng or random).shuffle(pool)
+
+        american = rotation.pick_american(pool, shape['american'], rng)
+        rotation.record_round(resting, american, rng)
+        if american:
+            pool = [p for p in pool if p not in american]
+
+        groups = group_players(pool[:regular * step], step, history.times_met, time_budget, ratings, rng)
+        if shape['singles']:
+            groups.append(tuple(pool[regular * step:regular * step + 2]))
+        if american:
+            groups.append(tuple(american))
+        history.record_round(groups)
+        plan.append({'round': number + 1, 'groups': groups, 'resting': resting, 'american': american,
+                     'regular': regular, 'courts': infos})
+
+    # Second sweep: regroup each round against the rest of the night, now
+    # that later rounds are known as well as earlier ones.
+    step = 2 if match_type == 'Singles' else 4
+    for entry in plan:
+        regular = entry.pop('regular')
+        if regular > 1:
+            on_court = entry['groups'][:regular]
+            history.record_round(on_court, -1)
+            regrouped = group_players([p for g in on_court for p in g], step, history.times_met,
+                                      time_budget, ratings, rng)
+            history.record_round(regrouped)
+            entry['groups'][:regular] = regrouped
+
+    for entry in plan:
+        entry['matches'], _ = assign_courts(entry.pop('groups'), entry.pop('courts'))
+    return plan
@@ -0,0 +1,82 @@
+import threading
+
+# Elo-style skill ratings from submitted game scores. Teams are rated as the
+# mean of their players, and the result is the share of games won, so a
+# 6-4 win moves ratings less than a 6-0. Each court is rated once, in
+# O(players on it); re-submitting a court first backs out what it applied
+# before, so courts of one round can be submitted separately.
+
+DEFAULT_RATING = 1500.0
+K_FACTOR = 32.0
+
+
+def split_sides(match):
+    if len(match) == 2:
+        return (match[0],), (match[1],)
+    if len(match) == 4:
+        return tuple(match[:2]), tuple(match[2:])
+    return None  # American doubles groups aren't rated
+
+
+class RatingBook:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ratings = {}
+        self.applied = {}  # (night, round, court) -> {player: change}
+
+    def rating(self, player):
+        return self.ratings.get(player, DEFAULT_RATING)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.ratings)
+
+    def rate_round(self, night, round_number, matches, scores):
+        with self.lock:
+            for court, _ in matches:
+                key = (night, str(round_number), str(court))
+                for player, change in self.applied.pop(key, {}).items():
+                    self.ratings[player] = self.rating(player) - change
+
+            changes = {}
+            for court, match in matches:
+                sides = split_sides(match)
+                if sides is None or any(p not in scores for p in match):
+                    continue
+                court_changes = self.applied[(night, str(round_number), str(court))] = {}
+                side_a, side_b = sides
+                games_a = sum(scores[p] for p in side_a) / len(side_a)
+                games_b = sum(scores[p] for p in side_b) / len(side_b)
+                if games_a + games_b == 0:
+                    continue
+                rating_a = sum(self.rating(p) for p in side_a) / len(side_a)
+                rating_b = sum(self.rating(p) for p in side_b) / len(side_b)
+                expected = 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+                change = K_FACTOR * (games_a / (games_a + games_b) - expected)
+                for p in side_a:
+                    court_changes[p] = change
+                for p in side_b:
+                    court_changes[p] = -change
+                changes.update(court_changes)
+
+            for player, change in changes.items():
+                self.ratings[player] = self.rating(player) + change
+            return changes
+
+
+def ratings_from_rows(rows):
+    # Replays score-ledger rows round by round, in the order they were played
+    rounds = {}
+    for row in rows:
+        if not row['court']:
+            continue  # imported totals have no match to rate
+        entry = rounds.setdefault((row['night'], row['round']), ({}, {}))
+        courts, scores = entry
+        courts.setdefault(row['court'], {})[int(row['slot'])] = row['player']
+        scores[row['player']] = row['games']
+
+    book = RatingBook()
+    for (night, number), (courts, scores) in rounds.items():
+        matches = [(court, tuple(slots[i] for i in sorted(slots))) for court, slots in courts.items()]
+        book.rate_round(night, number, matches, scores)
+    return book
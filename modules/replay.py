@@ -0,0 +1,137 @@
+import json
+import random
+
+from modules.ladder import apply_moves, ladder_moves
+from modules.night import Night
+from modules.pairing import DEFAULT_TIME_BUDGET
+from modules.planner import plan_night
+from modules.rounds import schedule_round
+
+# Seeded scheduling with replay. Every scheduling step (one generated round,
+# or a block of rounds planned together) runs on its own random.Random(seed)
+# and is logged as a compact entry: the seed, who joined or left since the
+# step before, and only the settings that changed. Replaying the log on an
+# empty night regenerates every round, pair count and rest counter exactly
+# for as long as the scheduler itself is unchanged, so saved nights keep
+# their round records and the log is only used to draw rounds again.
+# Ladder rounds also log who moved up and down, as the scores stood when
+# the round was drawn, so correcting a score later doesn't change them.
+
+SETTINGS = {'kind': 'round', 'courts': [], 'match_type': 'Singles', 'allow_american': False,
+            'ratings': None, 'at': None, 'dusk': None, 'availability': {}, 'rounds': 1,
+            'round_minutes': None, 'ladder': False, 'time_budget': DEFAULT_TIME_BUDGET}
+
+
+def new_seed():
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def roster_delta(roster, players):
+    # (joined, left), each in order; the roster itself keeps join order so
+    # a step doesn't depend on how the caller happened to list players
+    here = set(players)
+    known = set(roster)
+    return [p for p in players if p not in known], [p for p in roster if p not in here]
+
+
+def apply_delta(roster, joined, left):
+    left = set(left)
+    return [p for p in roster if p not in left] + list(joined)
+
+
+def logged_settings(log):
+    settings = dict(SETTINGS)
+    for entry in log:
+        settings.update((k, v) for k, v in entry.items() if k in SETTINGS)
+    return settings
+
+
+def run_step(night, settings, entry):
+    rng = random.Random(entry['seed'])
+    apply_moves(night.rotation.ladder, entry.get('up', ()), entry.get('down', ()))
+    if settings['kind'] == 'plan':
+        planned = plan_night(night.roster, settings['courts'], settings['rounds'], settings['match_type'],
+                             settings['allow_american'], night.history, settings['time_budget'],
+                             ratings=settings['ratings'],
+                             rotation=night.rotation, start=settings['at'],
+                             round_minutes=settings['round_minutes'], dusk=settings['dusk'],
+                             availability=settings['availability'], rng=rng)
+        rounds = [entry['matches'] for entry in planned]
+    else:
+        matches, _, _ = schedule_round(night.roster, settings['courts'], settings['match_type'],
+                                       settings['allow_american'], night.history, night.rotation,
+                                       settings['ratings'], settings['at'], settings['dusk'],
+                                       settings['availability'], rng, settings['ladder'],
+                                       settings['time_budget'])
+        rounds = [matches]
+    records = [night.add_round(matches) for matches in rounds]
+    night.logged_rounds += len(records)
+    return records
+
+
+def step_settings(players, settings):
+    # Every setting of a step, through JSON so the live step sees exactly
+    # what a replay will; ratings are cut down to the players there
+    ratings = settings.get('ratings')
+    if ratings is not None:
+        settings = {**settings, 'ratings': {p: ratings[p] for p in players if p in ratings}}
+    settings = json.loads(json.dumps({**SETTINGS, **settings}))
+    if settings['ladder'] and settings['kind'] == 'plan':
+        raise ValueError("Ladder rounds follow the scores, so they can't be planned ahead")
+    return settings
+
+
+def schedule(night, players, seed=None, **settings):
+    # One logged step on night: a round, or with kind='plan' and rounds=N a
+    # planned block. Settings left out take their defaults (SETTINGS), not
+    # the previous step's. Returns the new round records. Ladder steps are
+    # single rounds; planning ahead needs scores not yet played.
+    if seed is None:
+        seed = new_seed()
+    settings = step_settings(players, settings)
+    previous = logged_settings(night.log)
+    entry = {'seed': seed}
+    entry.update((k, v) for k, v in settings.items() if previous[k] != v)
+    joined, left = roster_delta(night.roster, players)
+    if joined:
+        entry['join'] = joined
+    if left:
+        entry['leave'] = left
+    if settings['ladder'] and night.rounds:
+        last = night.rounds[-1]
+        up, down = ladder_moves(night.matches(last), night.scores(last))
+        if up:
+            entry.update(up=up, down=down)
+    night.log.append(entry)
+    night.roster = apply_delta(night.roster, joined, left)
+    return run_step(night, settings, entry)
+
+
+def replay(log, rounds=None):
+    # Rebuilds a night from its log; with rounds, stops once that many exist
+    night = Night()
+    settings = dict(SETTINGS)
+    for entry in log:
+        if rounds is not None and len(night.rounds) >= rounds:
+            break
+        settings.update((k, v) for k, v in entry.items() if k in SETTINGS)
+        night.roster = apply_delta(night.roster, entry.get('join', ()), entry.get('leave', ()))
+        night.log.append(entry)
+        run_step(night, settings, entry)
+    return night
+
+
+def regenerate(log, number):
+    # Round `number` scheduled again from the log, without its scores
+    night = replay(log, number)
+    return night.matches(night.round(number))
+
+
+def round_seeds(log):
+    # Seed of the step that scheduled each round, in round order
+    seeds = []
+    settings = dict(SETTINGS)
+    for entry in log:
+        settings.update((k, v) for k, v in entry.items() if k in SETTINGS)
+        seeds.extend([entry['seed']] * (settings['rounds'] if settings['kind'] == 'plan' else 1))
+    return seeds
@@ -0,0 +1,120 @@
+import heapq
+import random
+
+# Rest rotation for one night. Each player keeps fixed counters (rests,
+# American doubles turns, round of their last rest, and a random tiebreak
+# drawn when those last changed) and the next sit-outs come off a heap
+# ordered by fewest rests, then longest since the last one, so nobody rests
+# twice before everyone has rested once. Picking k sit-outs is O(k log n);
+# outdated heap entries are skipped on the way. Arrivals and departures are
+# applied as a delta to the active set, so nobody's counters are reset when
+# the roster changes mid-night.
+#
+# Every random draw comes from the rng passed in (the random module by
+# default), and the tiebreaks are kept with the counters, so a seeded night
+# picks the same sit-outs again after a save and reload.
+
+RESTS, AMERICAN, LAST_REST, TIEBREAK = 0, 1, 2, 3
+
+
+class Rotation:
+    def __init__(self, players=(), rng=None):
+        self.round = 0
+        self.counters = {}  # player -> [rests, american, last rest round, tiebreak]
+        self.heap = []  # (rests, last rest round, tiebreak, player)
+        self.active = set()
+        self.design = {}  # where the night is in its round robin, see modules.designs
+        self.ladder = {}  # player -> ladder court, in ladder order, see modules.ladder
+        self.set_active(players, rng)
+
+    def set_active(self, players, rng=None):
+        # Only the players joining or leaving are touched. Arrivals, new or
+        # returning, start no lower than the least-rested player still on
+        # and count their time away as their latest rest, so they neither
+        # sit out straight away nor skip their turn; those who leave keep
+        # their counters for when they come back.
+        players = list(players)
+        active = set(players)
+        departed = self.active - active
+        arrived = [p for p in players if p not in self.active]
+        if arrived:
+            rng = rng or random
+            floor = min((self.counters[p][RESTS] for p in self.active - departed), default=None)
+            for p in arrived:
+                self._join(p, floor, rng)
+        self.active = active
+        return set(arrived), departed
+
+    def _join(self, player, floor, rng):
+        counters = self.counters.get(player)
+        if counters is None:
+            self.counters[player] = [floor or 0, 0, -1 if floor is None else self.round, rng.random()]
+        elif floor is not None:
+            counters[RESTS] = max(counters[RESTS], floor)
+            counters[LAST_REST] = self.round
+            counters[TIEBREAK] = rng.random()
+        self._push(player)
+
+    def _push(self, player):
+        counters = self.counters[player]
+        heapq.heappush(self.heap, (counters[RESTS], counters[LAST_REST], counters[TIEBREAK], player))
+
+    def pick_resting(self, players, count, rng=None):
+        self.set_active(players, rng)
+        active = set(players)
+        chosen, absent = [], []
+        while len(chosen) < count and self.heap:
+            entry = heapq.heappop(self.heap)
+            player = entry[3]
+            counters = self.counters[player]
+            if (counters[RESTS], counters[LAST_REST], counters[TIEBREAK]) != entry[:3]:
+                continue  # superseded by a later push
+            if player in active:
+                chosen.append(player)
+                active.discard(player)
+            else:
+                absent.append(entry)
+        for entry in absent:
+            heapq.heappush(self.heap, entry)
+        for player in chosen:
+            self._push(player)  # put back until record_round updates them
+        return chosen
+
+    def pick_american(self, players, count, rng=None):
+        if count <= 0:
+            return []
+        rng = rng or random
+        return heapq.nsmallest(count, players, key=lambda p: (self.counters[p][AMERICAN], rng.random()))
+
+    def record_round(self, resting=(), american=(), rng=None):
+        rng = rng or random
+        self.round += 1
+        for p in resting:
+            counters = self.counters[p]
+            counters[RESTS] += 1
+            counters[LAST_REST] = self.round
+            counters[TIEBREAK] = rng.random()
+            self._push(p)
+        for p in american:
+            self.counters[p][AMERICAN] += 1
+        if len(self.heap) > 2 * len(self.counters) + 16:
+            self._rebuild()
+
+    def _rebuild(self):
+        self.heap = [(c[RESTS], c[LAST_REST], c[TIEBREAK], p) for p, c in self.counters.items()]
+        heapq.heapify(self.heap)
+
+    def to_dict(self):
+        return {'round': self.round, 'players': {p: list(c) for p, c in self.counters.items()},
+                'active': sorted(self.active), 'design': self.design, 'ladder': self.ladder}
+
+    @classmethod
+    def from_dict(cls, data):
+        rotation = cls()
+        rotation.round = data.get('round', 0)
+        rotation.counters = {p: list(c) for p, c in data.get('players', {}).items()}
+        rotation.active = set(data.get('active', rotation.counters))
+        rotation.design = dict(data.get('design', {}))
+        rotation.ladder = dict(data.get('ladder', {}))
+        rotation._rebuild()
+        return rotation
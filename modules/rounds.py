@@ -0,0 +1,150 @@
+import random
+
+from modules.courts import assign_courts, assign_in_order, court_counts, open_courts
+from modules.designs import design_round
+from modules.history import PairHistory
+from modules.ladder import ladder_round
+from modules.pairing import DEFAULT_TIME_BUDGET, group_players
+from modules.planner import present_players, round_shape
+from modules.rotation import Rotation
+
+# Round generators behind the two apps, kept free of Streamlit so they can
+# be run headless (benchmarks, batch jobs). Both take an optional rng
+# (random.Random) and then draw only from it, so a seeded round can be
+# generated again exactly; without one they use the random module.
+
+
+def schedule_round(players, courts, match_type='Singles', allow_american=False, history=None, rotation=None,
+                   ratings=None, at=None, dusk=None, availability=None, rng=None, ladder=False,
+                   time_budget=DEFAULT_TIME_BUDGET):
+    # courts may be names or court records; at and dusk are minutes since
+    # midnight, and limit the round to the courts open (and lit) at `at`
+    # and to the players available then. With ladder, courts follow the
+    # rotation's king-of-the-court ladder (see modules.ladder) and ratings
+    # only order the players starting it.
+    if history is None:
+        history = PairHistory(players)
+    if rotation is None:
+        rotation = Rotation(players, rng)
+    players = present_players(players, availability, at)
+
+    infos = open_courts(courts, at, dusk)
+    court_count, singles_courts = court_counts(infos, match_type)
+
+    if ladder:
+        shape = round_shape(len(players), court_count, match_type, allow_american, singles_courts)
+        resting = rotation.pick_resting(players, shape['rest'], rng)
+        matches = ladder_round(rotation.ladder, players, shape, resting, ratings, rng)
+        american = matches[-1] if shape['american'] else ()
+        rotation.record_round(resting, american, rng)
+        history.record_round(matches)
+        named_matches, _ = assign_in_order(matches, infos)
+        return named_matches, history, rotation
+
+    # A singles round robin, when one fits, needs no search (skill balancing does)
+    designed = None
+    if ratings is None:
+        designed = design_round(rotation.design, players, court_count, match_type, allow_american, rng,
+                                history.times_met)
+    if designed is not None:
+        matches, resting = designed
+        rotation.set_active(players, rng)
+        rotation.record_round(resting, (), rng)
+        history.record_round(matches)
+        named_matches, _ = assign_courts(matches, infos)
+        return named_matches, history, rotation
+
+    shape = round_shape(len(players), court_count, match_type, allow_american, singles_courts)
+    step = shape['step']
+    regular = shape['matches']
+
+    resting = rotation.pick_resting(players, shape['rest'], rng)
+    sitting_out = set(resting)
+    pool = [p for p in players if p not in sitting_out]
+    (rng or random).shuffle(pool)
+
+    american = rotation.pick_american(pool, shape['american'], rng)
+    if american:
+        pool = [p for p in pool if p not in american]
+
+    matches = group_players(pool[:regular * step], step, history.times_met, time_budget, ratings, rng)
+    if shape['singles']:
+        matches.append(tuple(pool[regular * step:regular * step + 2]))
+    if american:
+        matches.append(tuple(american))
+    rotation.record_round(resting, american, rng)
+    history.record_round(matches)
+
+    named_matches, _ = assign_courts(matches, infos)
+    return named_matches, history, rotation
+
+
+def generate_round(players, courts, game_type='Doubles', leftover_option='Rest',
+                   history=None, recent_american=None, ratings=None, at=None, dusk=None, rng=None,
+                   design=None):
+    # design: a dict kept for the night (see modules.designs) to follow a
+    # singles round robin whenever one fits
+    if history is None:
+        history = PairHistory(players)
+    if recent_american is None:
+        recent_american = set()
+    draw = rng or random
+
+    players = list(players)
+    draw.shuffle(players)
+    infos = open_courts(courts, at, dusk)
+    matches = []
+    used_players = []  # in court order, so seeded picks don't depend on set order
+
+    designed = None
+    if design is not None and ratings is None:
+        designed = design_round(design, sorted(players), court_counts(infos, game_type)[0], game_type,
+                                leftover_option == "Play American Doubles", rng, history.times_met)
+    if designed is not None:
+        groups, resting = designed
+        matches = [(court, list(match)) for court, match in assign_courts(groups, infos)[0]]
+        if resting:
+            matches.append(("Rest", resting))
+        history.record_round(groups)
+        return matches, recent_american
+
+    required_players = 4 if game_type == "Doubles" else 2
+    max_matches_possible = len(players) // required_players
+    match_count = min(court_counts(infos, game_type)[0], max_matches_possible)
+    on_court = players[:match_count * required_players]
+    groups = group_players(on_court, required_players, history.times_met, ratings=ratings, rng=rng)
+    for court, match_players in assign_courts(groups, infos)[0]:
+        matches.append((court, list(match_players)))
+        used_players.extend(match_players)
+
+    leftovers = players[len(on_court):]
+    if leftovers:
+        if game_type == "Singles":
+            if len(leftovers) == 1:
+                if leftover_option == "Play American Doubles" and len(used_players) >= 2:
+                    candidates = [p for p in used_players if p not in recent_american]
+                    if len(candidates) < 2:
+                        candidates = list(used_players)
+                    picked = draw.sample(candidates, 2)
+                    recent_american = set(picked + leftovers)
+                    matches.append(("Rotate", leftovers + picked))
+                else:
+                    matches.append(("Rest", leftovers))
+        else:
+            if len(leftovers) == 3:
+                matches.append(("Overflow", leftovers))
+            elif len(leftovers) == 2:
+                matches.append(("Overflow", leftovers))
+            elif len(leftovers) == 1:
+                if leftover_option == "Rest":
+                    matches.append(("Rest", leftovers))
+                elif len(used_players) >= 3:
+                    candidates = [p for p in used_players if p not in recent_american]
+                    if len(candidates) < 3:
+                        candidates = list(used_players)
+                    picked = draw.sample(candidates, 3)
+                    recent_american = set(picked + leftovers)
+                    matches.append(("Rotate", leftovers + picked))
+
+    history.record_round([m for court, m in matches if court != "Rest"])
+    return matches, recent_american
@@ -1,38 +1,12 @@
 import streamlit as st
 import random
-import time
-from collections import defaultdict
-
-# Embed base64-encoded sound for alert
-import base64
-
-ALERT_SOUND = """
-<audio id="beep" autoplay>
-  <source src="data:audio/wav;base64,UklGRiQAAABXQVZFZm10IBAAAAABAAEAESsAACJWAAACABAAZGF0YVgAAAAA" type="audio/wav">
-  Your browser does not support the audio element.
-</audio>
-<script>
-document.getElementById("beep").play();
-</script>
-"""
-
-CLOCK_STYLE = """
-<style>
-.big-clock {
-    font-size: 72px;
-    font-weight: bold;
-    color: #00FF00;
-    background-color: #000000;
-    padding: 20px;
-    text-align: center;
-    border-radius: 15px;
-}
-</style>
-"""
+from modules.history import PairHistory
+from modules.pairing import group_players
+from modules.timer import render_timer, start_timer
 
 def schedule_matches():
     if 'history' not in st.session_state:
-        st.session_state.history = defaultdict(lambda: defaultdict(int))
+        st.session_state.history = PairHistory(st.session_state.players)
 
     st.header("Schedule Matches")
     game_type = st.radio("Select Match Type", ["Doubles", "Singles"])
@@ -45,31 +19,17 @@ def schedule_matches():
         courts = st.session_state.courts.copy()
         matches = []
         used_players = set()
+        history = st.session_state.history
 
-        def already_played(p1, p2):
-            return st.session_state.history[p1][p2] > 0
-
-        def record_match(players_in_match):
-            for i in range(len(players_in_match)):
-                for j in range(i + 1, len(players_in_match)):
-                    st.session_state.history[players_in_match[i]][players_in_match[j]] += 1
-                    st.session_state.history[players_in_match[j]][players_in_match[i]] += 1
-
-        while courts and len(players) >= (4 if game_type == "Doubles" else 2):
-            if game_type == "Doubles" and len(players) >= 4:
-                match_players = players[:4]
-                players = players[4:]
-            elif game_type == "Singles" and len(players) >= 2:
-                match_players = players[:2]
-                players = players[2:]
-            else:
-                break
+        required_players = 4 if game_type == "Doubles" else 2
+        match_count = min(len(courts), len(players) // required_players)
+        on_court = players[:match_count * required_players]
+        for match_players in group_players(on_court, required_players, history.times_met):
             court = courts.pop(0)
-            matches.append((court, match_players))
+            matches.append((court, list(match_players)))
             used_players.update(match_players)
-            record_match(match_players)
 
-        leftovers = players
+        leftovers = players[len(on_court):]
         if leftovers:
             if game_type == "Singles":
                 if len(leftovers) == 1:
@@ -85,6 +45,7 @@ def schedule_matches():
                     else:
                         matches.append(("Rotate", leftovers + random.sample(list(used_players), 3)))
 
+        history.record_round([m for court, m in matches if court != "Rest"])
         st.session_state.schedule.append(matches)
         st.session_state.round += 1
 
@@ -94,17 +55,10 @@ def schedule_matches():
         for court, players in current_matches:
             st.markdown(f"**Court {court}:** {' vs. '.join(players)}")
 
+        timer_key = f"round{st.session_state.round}"
         if st.button("Start Play"):
-            countdown = match_time * 60  # seconds
-            st.markdown(CLOCK_STYLE, unsafe_allow_html=True)
-            timer_placeholder = st.empty()
-            for remaining in range(countdown, 0, -1):
-                mins, secs = divmod(remaining, 60)
-                timer_placeholder.markdown(f"<div class='big-clock'>{mins:02d}:{secs:02d}</div>", unsafe_allow_html=True)
-                time.sleep(1)
-            timer_placeholder.markdown("<div class='big-clock'>00:00</div>", unsafe_allow_html=True)
-            st.markdown(ALERT_SOUND, unsafe_allow_html=True)
-            st.success("Time's up! Round is over.")
+            start_timer(timer_key, match_time)
+        render_timer(timer_key)
 
     col1, col2 = st.columns(2)
     if col1.button("Previous Round"):
@@ -0,0 +1,82 @@
+import csv
+import os
+import threading
+
+from modules.ratings import ratings_from_rows
+from modules.stats import stats_from_rows
+from utils.cache import cached, remember
+from utils.ledger import ScoreLedger
+
+# Score submission, skill ratings, player stats and leaderboards. pandas is
+# only imported when a stats or leaderboard table is actually built.
+
+SCORE_FILE = "scores.csv"
+
+# Ratings and stats read the ledger's rows around each submission, so one
+# submission at a time (courts may be submitted from several devices at once)
+_submit_lock = threading.Lock()
+
+
+def read_legacy_totals(path):
+    # Old games-only leaderboard written by DataFrame.to_csv: ",games" header
+    totals = {}
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) >= 2 and row[1]:
+                totals[row[0]] = int(float(row[1]))
+    return totals
+
+
+def load_scores(storage, legacy_file=SCORE_FILE):
+    # One ledger per store for the whole process; rebuilt only when the
+    # stored scores change underneath it (another process, a compaction).
+    def build():
+        ledger = ScoreLedger(storage)
+        if not ledger.scores and os.path.exists(legacy_file):
+            ledger.import_totals(read_legacy_totals(legacy_file))
+        return ledger
+    return cached(('ledger', storage.key), storage.version('scores'), build)
+
+
+def load_ratings(storage):
+    # Replayed from the ledger once, then kept current by update_scores
+    ledger = load_scores(storage)
+    return cached(('ratings', storage.key), storage.version('scores'),
+                  lambda: ratings_from_rows(ledger.latest_rows()))
+
+
+def load_stats(storage):
+    ledger = load_scores(storage)
+    return cached(('stats', storage.key), storage.version('scores'),
+                  lambda: stats_from_rows(ledger.latest_rows()))
+
+
+def keep_scores(ledger, ratings=None, stats=None):
+    # The ledger already holds its own writes, so don't rebuild it for them
+    version = ledger.store.version('scores')
+    remember(('ledger', ledger.store.key), version, ledger)
+    if ratings is not None:
+        remember(('ratings', ledger.store.key), version, ratings)
+    if stats is not None:
+        remember(('stats', ledger.store.key), version, stats)
+
+
+def update_scores(ledger, night_id, round_info, ratings=None, stats=None):
+    players = [p for _, match in round_info['matches'] for p in match]
+    with _submit_lock:
+        before = ledger.round_rows(night_id, round_info['round'], players) if stats is not None else None
+        changed = ledger.submit_round(night_id, round_info['round'], round_info['matches'], round_info['scores'])
+        if changed and ratings is not None:
+            ratings.rate_round(night_id, round_info['round'], round_info['matches'], round_info['scores'])
+        if changed and stats is not None:
+            stats.replace_round(before, ledger.round_rows(night_id, round_info['round'], players))
+        keep_scores(ledger, ratings, stats)
+    return changed
+
+
+def leaderboard(totals, column='games'):
+    import pandas as pd
+    df = pd.DataFrame.from_dict(totals, orient='index', columns=[column])
+    return df.sort_values(column, ascending=False)
@@ -0,0 +1,128 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+# Headless season generator: plans N nights of M rounds for the club's
+# players and courts, read from the same store as the apps (TENNIS_STORAGE,
+# TENNIS_DB), so court details and, with --balance, skill ratings apply too.
+# --players, --courts and --scores read JSON or CSV files instead. It
+# writes each night's schedule as CSV and PDF with the same writers as the
+# in-app export, plus one season.csv covering every night. Nights are
+# independent, so they are planned and rendered in a process pool. Each
+# night is drawn from its own seed, listed in season.csv, so any night can
+# be planned again exactly (see modules.replay).
+#
+#   python modules/season.py --nights 30 --rounds 8 --match-type Doubles
+#   python modules/season.py --balance --start 2026-01-06 --every 7 --output season
+#   python modules/season.py --players data/players.json --courts data/courts.json --scores score_log.csv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.export import freeze_matches, write_night_csv, write_night_pdf
+from modules.planner import plan_night
+from modules.ratings import ratings_from_rows
+from modules.replay import new_seed
+from modules.scoring import load_ratings
+from utils.ledger import CSVScoreLog, ScoreLedger
+from utils.persistence import get_storage, load_data
+
+FORMATS = ['csv', 'pdf']
+
+
+def night_labels(count, start=None, every=7):
+    # Dated nights when a first date is given, numbered ones otherwise
+    if start is None:
+        return [f"night-{n + 1:03}" for n in range(count)]
+    first = date.fromisoformat(start)
+    return [(first + timedelta(days=n * every)).isoformat() for n in range(count)]
+
+
+def plan_one_night(job):
+    # Runs in a worker
+    planned = plan_night(job['players'], job['courts'], job['rounds'], job['match_type'],
+                         job['allow_american'], ratings=job['ratings'], rng=random.Random(job['seed']))
+    rounds = [(entry['round'], freeze_matches(entry['matches'])) for entry in planned]
+    paths = []
+    for kind in job['formats']:
+        path = os.path.join(job['output'], f"{job['label']}.{kind}")
+        if kind == 'pdf':
+            write_night_pdf(rounds, path)
+        else:
+            write_night_csv(rounds, path)
+        paths.append(path)
+    return job['label'], rounds, paths
+
+
+def plan_season(players, courts, nights, rounds, match_type='Doubles', allow_american=False,
+                ratings=None, labels=None, output='season', formats=FORMATS, workers=None, seed=None):
+    # seed: night n is drawn from seed + n; without one every night gets a fresh seed
+    labels = labels or night_labels(nights)
+    os.makedirs(output, exist_ok=True)
+    jobs = [{'label': label, 'players': list(players), 'courts': list(courts), 'rounds': rounds,
+             'match_type': match_type, 'allow_american': allow_american, 'ratings': ratings,
+             'output': output, 'formats': formats, 'seed': new_seed() if seed is None else seed + n}
+            for n, label in enumerate(labels[:nights])]
+    if workers == 1:
+        results = [plan_one_night(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(plan_one_night, jobs))
+
+    with open(os.path.join(output, 'season.csv'), 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(["Night", "Seed", "Round", "Court", "Players"])
+        for job, (label, night_rounds, _) in zip(jobs, results):
+            for number, matches in night_rounds:
+                for court, match in matches:
+                    writer.writerow([label, job['seed'], number, court, ', '.join(match)])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan a season of club nights headless.")
+    parser.add_argument('--players', help="players JSON file instead of the club's store")
+    parser.add_argument('--courts', help="courts JSON file instead of the club's store")
+    parser.add_argument('--balance', action='store_true', help="balance teams by the club's skill ratings")
+    parser.add_argument('--scores', help="score log CSV to rate players from instead (implies --balance)")
+    parser.add_argument('--nights', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=8)
+    parser.add_argument('--match-type', default='Doubles', choices=['Singles', 'Doubles'])
+    parser.add_argument('--american', action='store_true', help="allow American doubles")
+    parser.add_argument('--start', help="date of the first night (YYYY-MM-DD) to name nights by date")
+    parser.add_argument('--every', type=int, default=7, help="days between nights")
+    parser.add_argument('--formats', nargs='+', default=FORMATS, choices=FORMATS)
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--output', default='season')
+    parser.add_argument('--seed', type=int, help="plan night n from seed + n, for a repeatable season")
+    args = parser.parse_args(argv)
+
+    storage = None
+    if not (args.players and args.courts and (args.scores or not args.balance)):
+        storage = get_storage()
+    players = load_data(args.players) if args.players else list(storage.players())
+    courts = load_data(args.courts) if args.courts else list(storage.court_entries())
+    if not players or not courts:
+        print("Need players and courts: add them in the app, or pass --players and --courts", file=sys.stderr)
+        return 1
+    ratings = None
+    if args.scores:
+        ratings = ratings_from_rows(ScoreLedger(CSVScoreLog(args.scores)).latest_rows()).snapshot()
+    elif args.balance:
+        ratings = load_ratings(storage).snapshot()
+
+    start = time.perf_counter()
+    results = plan_season(players, courts, args.nights, args.rounds, args.match_type, args.american,
+                          ratings, night_labels(args.nights, args.start, args.every), args.output,
+                          args.formats, args.workers, args.seed)
+    seconds = time.perf_counter() - start
+    print(f"Planned {len(results)} nights x {args.rounds} rounds for {len(players)} players "
+          f"on {len(courts)} courts in {seconds:.1f} s; wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
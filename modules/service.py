@@ -0,0 +1,171 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import wait as wait_for
+from concurrent.futures.process import BrokenProcessPool
+
+from modules.night import Night
+from modules.replay import schedule, step_settings
+from utils.cache import shared
+
+# Shared scheduling service for every club and session in the server
+# process. A scheduling step (see modules.replay) is submitted with a copy
+# of the night and runs in a bounded process pool, so a long search for one
+# club neither holds the GIL nor ties up another session's script run; the
+# session polls (or briefly waits) for the finished night and adopts it.
+# Each step's search budget is one of its settings, so it is logged and a
+# replay searches exactly as long. Each job also gets a wall-clock deadline
+# from that budget: past it, poll() gives up on the job (raising
+# SchedulerTimeout) and the session draws the step itself, so a full queue
+# or a slow machine costs one club's step its budget, not an open wait. A
+# pool whose worker died is replaced on the next submit.
+#
+# Results are cached by what the step depends on: the roster, the settings
+# (courts included) and the night so far (its seating digest, log and the
+# last round's scores, which ladder steps read). Devices that ask for the
+# same round at once share one job, and the first request's seed.
+# TENNIS_SCHEDULER_WORKERS=0 runs steps inline in the submitting thread.
+
+SCHEDULER_WORKERS = int(os.environ.get('TENNIS_SCHEDULER_WORKERS', os.cpu_count() or 1))
+MAX_PENDING = 32  # jobs queued or running before submit() turns work away
+CACHE_SIZE = 256  # finished jobs kept for polling and repeats
+WAIT_SECONDS = 0.5  # how long a script run waits before polling on a later run
+DEADLINE_SLACK = 5.0  # seconds a job may spend queued and starting a worker
+DEADLINE_FACTOR = 4  # search time a job may take, in time budgets per search
+
+
+class SchedulerBusy(Exception):
+    pass
+
+
+class SchedulerTimeout(Exception):
+    pass
+
+
+def run_job(job):
+    # Runs in a worker: the step on its own copy of the night, returned whole
+    night = Night.from_dict(job['night'])
+    schedule(night, job['players'], job['seed'], **job['settings'])
+    return night.to_dict()
+
+
+def job_key(night, players, settings):
+    last = list(night.rounds[-1].scores) if night.rounds else []
+    state = {'players': list(players), 'settings': settings, 'digest': night.digest(), 'log': night.log,
+             'last_scores': last, 'availability': night.availability}
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+
+def job_seconds(settings):
+    # How long a step may take before its deadline; a planned round is
+    # searched twice, once per sweep
+    searches = 2 * settings['rounds'] if settings['kind'] == 'plan' else 1
+    return DEADLINE_SLACK + DEADLINE_FACTOR * searches * settings['time_budget']
+
+
+def failed(future):
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+class SchedulingService:
+    def __init__(self, workers=SCHEDULER_WORKERS, max_pending=MAX_PENDING, cache_size=CACHE_SIZE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()  # ticket -> Future, least recently asked for first
+        self.deadlines = {}  # ticket -> time.monotonic() its job is given up at
+        self.pool = None  # started on the first job
+
+    def submit(self, night, players, seed, **settings):
+        # Returns a ticket for poll()/wait(); raises SchedulerBusy when the
+        # queue is full, so the caller can schedule inline instead.
+        settings = step_settings(players, settings)
+        ticket = job_key(night, players, settings)
+        with self.lock:
+            future = self.jobs.get(ticket)
+            # Reused unless it failed or is still running past its deadline
+            reuse = future is not None and not failed(future) and (
+                future.done() or time.monotonic() < self.deadlines[ticket])
+            if reuse:
+                self.jobs.move_to_end(ticket)
+                return ticket
+            if sum(1 for f in self.jobs.values() if not f.done()) >= self.max_pending:
+                raise SchedulerBusy("Too many rounds are being scheduled; try again shortly")
+            job = {'night': night.to_dict(), 'players': list(players), 'seed': seed,
+                   'settings': settings}
+            if self.workers:
+                pool = self._pool()
+                try:
+                    future = pool.submit(run_job, job)
+                except BrokenProcessPool:
+                    self.pool = None
+                    pool = self._pool()
+                    future = pool.submit(run_job, job)
+            else:
+                future = Future()
+            self.jobs[ticket] = future
+            self.jobs.move_to_end(ticket)
+            self.deadlines[ticket] = time.monotonic() + job_seconds(settings)
+            self._evict()
+        if self.workers:
+            future.add_done_callback(lambda done: self._check(done, pool))
+        else:
+            try:
+                future.set_result(run_job(job))
+            except Exception as exc:
+                future.set_exception(exc)
+        return ticket
+
+    def _pool(self):
+        # Spawned, not forked: the server process has threads running
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return self.pool
+
+    def _check(self, future, pool):
+        # A worker died (killed, out of memory): the pool's jobs have failed
+        # and it takes no more, so the next job starts a new one
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            with self.lock:
+                if self.pool is pool:
+                    self.pool = None
+
+    def _evict(self):
+        extra = len(self.jobs) - self.cache_size
+        for ticket in [t for t, f in self.jobs.items() if f.done()][:max(extra, 0)]:
+            del self.jobs[ticket]
+            del self.deadlines[ticket]
+
+    def poll(self, ticket):
+        # The finished night's to_dict(), or None while it's still queued or
+        # running; re-raises what the step raised (BrokenProcessPool if its
+        # worker died) and raises SchedulerTimeout past the job's deadline.
+        # A ticket that has dropped out of the cache raises KeyError.
+        future = self.jobs[ticket]
+        if future.done():
+            return future.result()
+        if time.monotonic() < self.deadlines[ticket]:
+            return None
+        future.cancel()  # only stops a job still queued; a running one can't be
+        raise SchedulerTimeout("Scheduling took too long")
+
+    def wait(self, ticket, timeout=WAIT_SECONDS):
+        # As poll, but blocks up to timeout seconds (never past the
+        # deadline) for the result first
+        future = self.jobs[ticket]
+        wait_for([future], max(min(timeout, self.deadlines[ticket] - time.monotonic()), 0))
+        return self.poll(ticket)
+
+
+def get_scheduler(workers=None):
+    # One service per worker count
+    if workers is None:
+        workers = SCHEDULER_WORKERS
+    return shared(('scheduler', workers), lambda: SchedulingService(workers))
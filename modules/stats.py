@@ -0,0 +1,176 @@
+import threading
+
+from utils.ledger import FIELDS
+
+# Per-player stats over the whole score history: games, rounds played, games
+# per round, win rate, rests, and who they partnered or played against. The
+# history is aggregated once with pandas groupbys; after that each submitted
+# round is folded in (a corrected one swapped out) in O(players in round),
+# and the sorted tables are rebuilt once per change, not on every rerun.
+
+STAT_COLUMNS = ['games', 'rounds', 'games_per_round', 'win_rate', 'rests']
+KEYS = ['night', 'round', 'court']
+
+
+def round_results(rows):
+    # (player, won, decided, partners, opponents) for one round's score rows.
+    # Within a court, the first half of the slots is one team and the second
+    # half the other; American groups have no teams and aren't counted.
+    courts = {}
+    for row in rows:
+        if row['court']:
+            courts.setdefault(row['court'], []).append(row)
+
+    results = []
+    for court_rows in courts.values():
+        if len(court_rows) not in (2, 4):
+            continue
+        court_rows.sort(key=lambda r: int(r['slot']))
+        half = len(court_rows) // 2
+        sides = (court_rows[:half], court_rows[half:])
+        means = [sum(r['games'] for r in side) / half for side in sides]
+        for index, side in enumerate(sides):
+            own, opp = means[index], means[1 - index]
+            others = sides[1 - index]
+            for row in side:
+                partners = [r['player'] for r in side if r is not row]
+                results.append((row['player'], int(own > opp), int(own != opp),
+                                partners, [r['player'] for r in others]))
+    return results
+
+
+class PlayerStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.players = {}  # player -> [games, rounds, wins, decided]
+        self.partners = {}  # player -> {partner: rounds together}
+        self.opponents = {}  # player -> {opponent: rounds against}
+        self.attended = {}  # player -> {night: [games, rounds]}
+        self.night_rounds = {}  # night -> {round: players scored}
+        self._views = None
+        self._night_view = None
+
+    def replace_round(self, old_rows, new_rows):
+        # old_rows are the ledger's rows for the round before it was
+        # (re)submitted, new_rows the ones after.
+        with self.lock:
+            self._apply(old_rows, -1)
+            self._apply(new_rows, 1)
+            self.version += 1
+
+    def _apply(self, rows, sign):
+        for row in rows:
+            player = row['player']
+            entry = self.players.setdefault(player, [0, 0, 0, 0])
+            entry[0] += sign * row['games']
+            if not row['court']:
+                continue  # imported totals: games only
+            entry[1] += sign
+            night = self.attended.setdefault(player, {}).setdefault(row['night'], [0, 0])
+            night[0] += sign * row['games']
+            night[1] += sign
+            rounds = self.night_rounds.setdefault(row['night'], {})
+            rounds[row['round']] = rounds.get(row['round'], 0) + sign
+            if not rounds[row['round']]:
+                del rounds[row['round']]
+
+        for player, won, decided, partners, opponents in round_results(rows):
+            entry = self.players[player]
+            entry[2] += sign * won
+            entry[3] += sign * decided
+            for counts, others in ((self.partners, partners), (self.opponents, opponents)):
+                seen = counts.setdefault(player, {})
+                for other in others:
+                    seen[other] = seen.get(other, 0) + sign
+
+    def rests(self, player):
+        return sum(len(self.night_rounds.get(night, ())) - rounds
+                   for night, (_, rounds) in self.attended.get(player, {}).items() if rounds)
+
+    def _table(self):
+        import pandas as pd
+        records = {}
+        for player, (games, rounds, wins, decided) in self.players.items():
+            records[player] = (games, rounds, games / rounds if rounds else 0.0,
+                               wins / decided if decided else 0.0, self.rests(player))
+        return pd.DataFrame.from_dict(records, orient='index', columns=STAT_COLUMNS)
+
+    def views(self):
+        # {column: table sorted by that column}, built once per version
+        with self.lock:
+            if self._views is None or self._views[0] != self.version:
+                table = self._table()
+                self._views = (self.version, {c: table.sort_values(c, ascending=False) for c in STAT_COLUMNS})
+            return self._views[1]
+
+    def night_view(self, night, players=()):
+        import pandas as pd
+        with self.lock:
+            key = (self.version, night, tuple(players))
+            if self._night_view is None or self._night_view[0] != key:
+                totals = {p: 0 for p in players}
+                for player, nights in self.attended.items():
+                    if night in nights:
+                        totals[player] = nights[night][0]
+                df = pd.DataFrame.from_dict(totals, orient='index', columns=['games'])
+                self._night_view = (key, df.sort_values('games', ascending=False))
+            return self._night_view[1]
+
+    def breakdown(self, player):
+        import pandas as pd
+        with self.lock:
+            df = pd.DataFrame({'partnered': pd.Series(self.partners.get(player, {}), dtype='int64'),
+                               'opposed': pd.Series(self.opponents.get(player, {}), dtype='int64')})
+        return df.fillna(0).astype(int).sort_values(['partnered', 'opposed'], ascending=False)
+
+
+def stats_from_rows(rows):
+    # Whole-history build, vectorised: one pass of groupbys over every row
+    stats = PlayerStats()
+    if not rows:
+        return stats
+    import pandas as pd
+
+    df = pd.DataFrame(rows, columns=FIELDS)
+    df['games'] = df['games'].astype(int)
+    games = df.groupby('player')['games'].sum()
+
+    played = df[df['court'] != ''].copy()
+    played['slot'] = played['slot'].astype(int)
+    courts = played.groupby(KEYS)
+    played['size'] = courts['player'].transform('size')
+    played['side'] = (courts['slot'].rank(method='first') - 1 >= played['size'] // 2).astype(int)
+    rounds = played.groupby('player').size()
+    per_night = played.groupby(['player', 'night'])['games'].agg(['sum', 'size'])
+    night_rounds = played.groupby(['night', 'round']).size()
+
+    sided = played[played['size'].isin([2, 4])]
+    teams = sided.groupby(KEYS + ['side'])['games'].mean().unstack('side')
+    sided = sided.join(teams, on=KEYS)
+    own = sided[0].where(sided['side'] == 0, sided[1])
+    opp = sided[1].where(sided['side'] == 0, sided[0])
+    sided = sided.assign(won=(own > opp).astype(int), decided=(own != opp).astype(int))
+    results = sided.groupby('player')[['won', 'decided']].sum()
+
+    seats = sided[KEYS + ['player', 'side']]
+    pairs = seats.merge(seats, on=KEYS)
+    pairs = pairs[pairs['player_x'] != pairs['player_y']]
+    same_side = pairs['side_x'] == pairs['side_y']
+    together = pairs[same_side].groupby(['player_x', 'player_y']).size()
+    against = pairs[~same_side].groupby(['player_x', 'player_y']).size()
+
+    wins = results['won'].to_dict()
+    decided = results['decided'].to_dict()
+    rounds = rounds.to_dict()
+    for player, total in games.items():
+        stats.players[player] = [int(total), int(rounds.get(player, 0)),
+                                 int(wins.get(player, 0)), int(decided.get(player, 0))]
+    for (player, night), total, count in per_night.itertuples(name=None):
+        stats.attended.setdefault(player, {})[night] = [int(total), int(count)]
+    for (night, number), count in night_rounds.items():
+        stats.night_rounds.setdefault(night, {})[number] = int(count)
+    for counts, series in ((stats.partners, together), (stats.opponents, against)):
+        for (player, other), count in series.items():
+            counts.setdefault(player, {})[other] = int(count)
+    return stats
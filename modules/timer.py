@@ -0,0 +1,84 @@
+import time
+from string import Template
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+# Match timers. Only a deadline is kept on the server; the countdown ticks in
+# the browser, so starting a timer never holds up the script run and any
+# number of courts can have their own, staggered clock.
+
+CLOCK_HTML = Template("""
+<style>
+.big-clock {
+    font-family: sans-serif;
+    font-size: ${size}px;
+    font-weight: bold;
+    color: #00FF00;
+    background-color: #000000;
+    padding: 10px;
+    text-align: center;
+    border-radius: 15px;
+}
+</style>
+<div class="big-clock" id="clock">--:--</div>
+<script>
+const end = Date.now() + ${remaining_ms};
+const clock = document.getElementById("clock");
+function tick() {
+  const left = Math.max(0, Math.round((end - Date.now()) / 1000));
+  const mins = String(Math.floor(left / 60)).padStart(2, "0");
+  const secs = String(left % 60).padStart(2, "0");
+  clock.textContent = mins + ":" + secs;
+  if (left === 0) {
+    clearInterval(timer);
+    if (${ring}) {
+      const sound = new Audio("https://actions.google.com/sounds/v1/alarms/alarm_clock.ogg");
+      sound.loop = true;
+      sound.play();
+      setTimeout(() => sound.pause(), 10000);
+    }
+  }
+}
+const timer = setInterval(tick, 250);
+tick();
+</script>
+""")
+
+
+def timers():
+    if 'timers' not in st.session_state:
+        st.session_state.timers = {}
+    return st.session_state.timers
+
+
+def start_timer(key, minutes):
+    timers()[key] = time.time() + minutes * 60
+
+
+def stop_timer(key):
+    timers().pop(key, None)
+
+
+def clear_timers():
+    timers().clear()
+
+
+def seconds_left(key):
+    deadline = timers().get(key)
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
+
+
+def render_timer(key, size=72):
+    left = seconds_left(key)
+    if left is None:
+        return
+    components.html(CLOCK_HTML.substitute(
+        size=size,
+        remaining_ms=int(left * 1000),
+        ring='true' if left > 0 else 'false',
+    ), height=size + 50)
+    if left == 0:
+        st.success("Time's up! Round is over.")
@@ -0,0 +1,59 @@
+import os
+import threading
+
+from utils.metrics import count
+
+# Process-wide cache shared by every Streamlit session. Each entry remembers
+# the version of the data it was built from (a file's mtime and size, or a
+# storage version counter); a read with a different version rebuilds it.
+# Loaders should return immutable values (tuples, frozen copies) so one
+# session can't change what another one sees. shared() keeps the
+# process's single instance of a service (a store, the archive) the same
+# way, created under a lock so sessions starting together get the same one.
+
+_entries = {}
+_lock = threading.Lock()
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def file_version(*paths):
+    version = []
+    count('disk.stat', len(paths))
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            version.append(None)
+        else:
+            version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def cached(key, version, loader):
+    entry = _entries.get(key)
+    if entry is not None and entry[0] == version:
+        count('cache.hit')
+        return entry[1]
+    count('cache.miss')
+    value = loader()
+    remember(key, version, value)
+    return value
+
+
+def remember(key, version, value):
+    with _lock:
+        _entries[key] = (version, value)
+
+
+def invalidate(key):
+    with _lock:
+        _entries.pop(key, None)
+
+
+def shared(key, factory):
+    # The one instance for key in this process, made by factory() on first use
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = factory()
+        return _instances[key]
@@ -0,0 +1,144 @@
+import csv
+import os
+import threading
+from datetime import datetime
+
+from utils.metrics import count
+
+# Append-only score log. Every "Submit Scores" appends only the rows that
+# changed, keyed by (night, round, player), so submitting the same round
+# twice is a no-op and a corrected score simply supersedes the old one.
+# All-time and nightly totals are kept up to date from the deltas.
+#
+# Rows are read and written through a store: CSVScoreLog below, or any
+# storage backend from utils.persistence. One ledger may be shared by many
+# sessions, so writes take the lock and readers get copies of the totals.
+
+FIELDS = ['night', 'round', 'court', 'slot', 'player', 'games', 'timestamp']
+COMPACT_MIN_ROWS = 500
+COMPACT_RATIO = 2  # compact once the log is this many times the live rows
+
+
+class CSVScoreLog:
+    def __init__(self, path):
+        self.path = path
+
+    def read_scores(self):
+        if not os.path.exists(self.path):
+            return []
+        count('disk.read')
+        with open(self.path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row['games'] = int(row['games'])
+        return rows
+
+    def append_scores(self, rows):
+        new_file = not os.path.exists(self.path)
+        count('disk.write')
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def rewrite_scores(self, rows):
+        tmp_path = self.path + '.tmp'
+        count('disk.write')
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, self.path)
+
+    def clear_scores(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ScoreLedger:
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.scores = {}  # (night, round, player) -> row
+        self.totals = {}
+        self.nights = {}
+        self.rows = 0
+        for row in store.read_scores():
+            self._apply(row)
+            self.rows += 1
+
+    def _apply(self, row):
+        key = (row['night'], row['round'], row['player'])
+        old = self.scores.get(key)
+        delta = row['games'] - (old['games'] if old else 0)
+        self.scores[key] = row
+        player = row['player']
+        self.totals[player] = self.totals.get(player, 0) + delta
+        night = self.nights.setdefault(row['night'], {})
+        night[player] = night.get(player, 0) + delta
+
+    def submit_round(self, night, round_number, matches, scores):
+        with self.lock:
+            return self._submit_round(night, round_number, matches, scores)
+
+    def _submit_round(self, night, round_number, matches, scores):
+        timestamp = datetime.now().isoformat(timespec='seconds')
+        changed = []
+        for court, match in matches:
+            for slot, player in enumerate(match):
+                if player not in scores:
+                    continue
+                old = self.scores.get((night, str(round_number), player))
+                games = int(scores[player])
+                if old is None or old['games'] != games or old['court'] != str(court):
+                    changed.append({
+                        'night': night, 'round': str(round_number), 'court': str(court),
+                        'slot': str(slot), 'player': player, 'games': games,
+                        'timestamp': timestamp,
+                    })
+        if not changed:
+            return 0
+
+        self.store.append_scores(changed)
+        for row in changed:
+            self._apply(row)
+        self.rows += len(changed)
+
+        if self.rows > COMPACT_MIN_ROWS and self.rows > COMPACT_RATIO * len(self.scores):
+            self.compact()
+        return len(changed)
+
+    def compact(self):
+        self.store.rewrite_scores(list(self.scores.values()))
+        self.rows = len(self.scores)
+
+    def round_rows(self, night, round_number, players):
+        with self.lock:
+            rows = (self.scores.get((night, str(round_number), p)) for p in players)
+            return [row for row in rows if row is not None]
+
+    def latest_rows(self):
+        with self.lock:
+            return list(self.scores.values())
+
+    def all_time_totals(self):
+        with self.lock:
+            return dict(self.totals)
+
+    def night_totals(self, night):
+        with self.lock:
+            return dict(self.nights.get(night, {}))
+
+    def import_totals(self, totals, night='legacy'):
+        # Seeds the log from an old games-only scores.csv
+        matches = [('', tuple(totals))]
+        return self.submit_round(night, 0, matches, totals)
+
+    def clear(self):
+        with self.lock:
+            self.store.clear_scores()
+            self.scores = {}
+            self.totals = {}
+            self.nights = {}
+            self.rows = 0
@@ -0,0 +1,167 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Per-rerun instrumentation. A Recorder collects timing spans and counters
+# for one unit of work (a Streamlit rerun, a batch job) on the thread that
+# runs it. span() and count() find the thread's recorder and do nothing
+# without one, so the calls can stay in hot paths: while nothing is being
+# recorded they cost a thread-local lookup. Finished records are appended
+# to a JSON-lines log, which summarise() aggregates across a night.
+
+METRICS_LOG = os.environ.get('TENNIS_METRICS_LOG', 'metrics.jsonl')
+PROFILE_LINES = 30
+
+class _Local(threading.local):
+    recorder = None
+
+
+_local = _Local()
+_log_lock = threading.Lock()
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'depth', 'start')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        recorder = self.recorder
+        self.depth = recorder.depth
+        recorder.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        recorder = self.recorder
+        end = time.perf_counter()
+        recorder.depth -= 1
+        recorder.spans.append((self.name, self.depth, self.start - recorder.start, end - self.start))
+        return False
+
+
+class Recorder:
+    # with Recorder(label, profile=True, memory=True): ...  then .record.
+    # tracemalloc is process-wide, so a memory capture also sees whatever
+    # other sessions allocate meanwhile; cProfile only sees this thread.
+    def __init__(self, label, profile=False, memory=False, log_path=None):
+        self.label = label
+        self.profiler = cProfile.Profile() if profile else None
+        self.memory = memory and not tracemalloc.is_tracing()
+        self.log_path = METRICS_LOG if log_path is None else log_path
+        self.spans = []  # (name, depth, start offset, seconds)
+        self.counters = {}
+        self.depth = 0
+        self.start = None
+        self.record = None
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def __enter__(self):
+        if self.memory:
+            tracemalloc.start()
+        _local.recorder = self
+        self.start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler is not None:
+            self.profiler.disable()
+        total = time.perf_counter() - self.start
+        _local.recorder = None
+        record = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'label': self.label,
+            'total_ms': round(total * 1000, 3),
+            'spans': [[name, depth, round(offset * 1000, 3), round(seconds * 1000, 3)]
+                      for name, depth, offset, seconds in sorted(self.spans, key=lambda s: s[2])],
+            'counters': self.counters,
+        }
+        if self.memory:
+            record['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+        if self.log_path:
+            append_record(record, self.log_path)
+        if self.profiler is not None:
+            text = io.StringIO()
+            pstats.Stats(self.profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            record['profile'] = text.getvalue()  # shown, not logged
+        self.record = record
+        return False
+
+
+def span(name):
+    recorder = _local.recorder
+    return NO_SPAN if recorder is None else _Span(recorder, name)
+
+
+def count(name, n=1):
+    recorder = _local.recorder
+    if recorder is not None:
+        recorder.counters[name] = recorder.counters.get(name, 0) + n
+
+
+def append_record(record, path=METRICS_LOG):
+    line = json.dumps(record) + '\n'
+    with _log_lock:
+        with open(path, 'a') as f:
+            f.write(line)
+
+
+def read_records(path=METRICS_LOG, since=None):
+    # since: ISO timestamp; older records are skipped
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r for r in records if since is None or r['time'] >= since]
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarise(records):
+    # One row per span name (and 'rerun' for whole records): how often it
+    # ran and its time spread in ms, plus every counter's total.
+    times = {}
+    counters = {}
+    for record in records:
+        times.setdefault('rerun', []).append(record['total_ms'])
+        for name, _, _, ms in record['spans']:
+            times.setdefault(name, []).append(ms)
+        for name, n in record['counters'].items():
+            counters[name] = counters.get(name, 0) + n
+    rows = []
+    for name, values in times.items():
+        values.sort()
+        rows.append({'span': name, 'count': len(values), 'mean_ms': sum(values) / len(values),
+                     'p50_ms': percentile(values, 50), 'p95_ms': percentile(values, 95),
+                     'max_ms': values[-1]})
+    rows.sort(key=lambda row: -row['p95_ms'])
+    return rows, counters
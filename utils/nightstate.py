@@ -0,0 +1,89 @@
+import copy
+import os
+import re
+import threading
+
+from utils.cache import shared
+from utils.metrics import count
+from utils.persistence import load_data, save_data
+
+# Shared night state for club mode. The rounds, pair history and rest
+# rotation of a night live here, keyed by club and night id, so the organiser
+# and every court-side tablet work on the same copy and a page refresh
+# loses nothing. Each night carries a version number: commit() only
+# succeeds against the version the caller read, and update() re-reads and
+# retries, so writers touching different courts never lose each other's
+# changes. An optional directory keeps a JSON snapshot of every night.
+#
+# The state itself is an instance of the night class given to the store;
+# it needs a no-argument constructor, to_dict() and from_dict().
+
+NIGHT_DIR = 'nights'
+MAX_RETRIES = 20
+
+
+class VersionConflict(Exception):
+    pass
+
+
+def night_key(club, night_id):
+    return f"{club}:{night_id}"
+
+
+class NightStore:
+    def __init__(self, night_class, directory=None):
+        self.night_class = night_class
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.nights = {}  # key -> (version, state)
+
+    def _path(self, key):
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', key) + '.json')
+
+    def _load(self, key):
+        entry = self.nights.get(key)
+        if entry is None:
+            data = load_data(self._path(key)) if self.directory else None
+            if data:
+                entry = (data['version'], self.night_class.from_dict(data['state']))
+            else:
+                entry = (0, self.night_class())
+            self.nights[key] = entry
+        return entry
+
+    def get(self, key):
+        # (version, private copy of the state)
+        with self.lock:
+            version, state = self._load(key)
+            return version, copy.deepcopy(state)
+
+    def commit(self, key, version, state):
+        with self.lock:
+            current, _ = self._load(key)
+            if current != version:
+                raise VersionConflict(key)
+            state = copy.deepcopy(state)
+            self.nights[key] = (version + 1, state)
+            if self.directory:
+                save_data(self._path(key), {'version': version + 1, 'state': state.to_dict()})
+            return version + 1
+
+    def update(self, key, change):
+        # change(state) edits a fresh copy in place; re-run on a conflict
+        for _ in range(MAX_RETRIES):
+            version, state = self.get(key)
+            change(state)
+            try:
+                return self.commit(key, version, state), state
+            except VersionConflict:
+                count('night.retry')
+                continue
+        raise VersionConflict(key)
+
+
+def get_night_store(night_class, directory=None):
+    # One store per snapshot directory; TENNIS_NIGHT_DIR="" keeps nights in
+    # memory only
+    if directory is None:
+        directory = os.environ.get('TENNIS_NIGHT_DIR', NIGHT_DIR)
+    return shared(('nights', directory), lambda: NightStore(night_class, directory or None))
@@ -1,13 +1,402 @@
+import copy
 import json
 import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils.cache import cached, file_version, invalidate, shared
+from utils.ledger import FIELDS, CSVScoreLog
+from utils.metrics import count
+
+# Storage backends. Both expose the same methods so the apps don't care
+# which one is in use: SQLite (default) writes one row per change and is
+# safe to share between Streamlit sessions; JSON keeps the old flat files.
+# Player and court lists are served from utils.cache as tuples and only
+# re-read after a write. A court entry is a bare name or a dict of court
+# attributes with a 'name' key (see modules.courts); storage keeps it as is,
+# and hands each caller its own copy, since the cached dicts are shared.
 
 def load_data(filepath):
     if os.path.exists(filepath):
+        count('disk.read')
         with open(filepath, 'r') as f:
             return json.load(f)
     return []
 
+def court_name(entry):
+    return entry if isinstance(entry, str) else str(entry['name'])
+
+def copy_entries(entries):
+    return tuple(entry if isinstance(entry, str) else copy.deepcopy(entry) for entry in entries)
+
 def save_data(filepath, data):
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
\ No newline at end of file
+    directory = os.path.dirname(filepath)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = filepath + '.tmp'
+    count('disk.write')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, filepath)
+
+
+class JSONStorage:
+    # Sessions run as threads of one process; the lock keeps their
+    # read-modify-write cycles on the same file from interleaving.
+    lock = threading.Lock()
+
+    def __init__(self, player_file='players.json', court_file='courts.json',
+                 score_file='score_log.csv', round_file='rounds.jsonl', import_file='imported.json'):
+        self.key = score_file
+        self.player_file = player_file
+        self.court_file = court_file
+        self.round_file = round_file
+        self.import_file = import_file
+        self.score_log = CSVScoreLog(score_file)
+        self.files = {'players': player_file, 'courts': court_file,
+                      'scores': score_file, 'rounds': round_file}
+
+    def version(self, name):
+        return file_version(self.files[name])
+
+    def _names(self, path):
+        return cached(path, file_version(path), lambda: tuple(load_data(path)))
+
+    def _add(self, path, name):
+        with self.lock:
+            names = load_data(path)
+            if name in names:
+                return False
+            names.append(name)
+            save_data(path, names)
+            invalidate(path)
+            return True
+
+    def _remove(self, path, name):
+        with self.lock:
+            names = load_data(path)
+            if name not in names:
+                return False
+            names.remove(name)
+            save_data(path, names)
+            invalidate(path)
+            return True
+
+    def players(self):
+        return self._names(self.player_file)
+
+    def add_player(self, name):
+        return self._add(self.player_file, name)
+
+    def remove_player(self, name):
+        return self._remove(self.player_file, name)
+
+    def clear_players(self):
+        with self.lock:
+            save_data(self.player_file, [])
+            invalidate(self.player_file)
+
+    def court_entries(self):
+        return copy_entries(self._names(self.court_file))
+
+    def courts(self):
+        return tuple(court_name(entry) for entry in self._names(self.court_file))
+
+    def add_court(self, name):
+        with self.lock:
+            entries = load_data(self.court_file)
+            if any(court_name(entry) == name for entry in entries):
+                return False
+            entries.append(name)
+            save_data(self.court_file, entries)
+            invalidate(self.court_file)
+            return True
+
+    def remove_court(self, name):
+        with self.lock:
+            entries = load_data(self.court_file)
+            kept = [entry for entry in entries if court_name(entry) != name]
+            if len(kept) == len(entries):
+                return False
+            save_data(self.court_file, kept)
+            invalidate(self.court_file)
+            return True
+
+    def save_court(self, entry):
+        # Adds the court, or replaces the entry with the same name
+        with self.lock:
+            name = court_name(entry)
+            entries = load_data(self.court_file)
+            for i, old in enumerate(entries):
+                if court_name(old) == name:
+                    entries[i] = entry
+                    break
+            else:
+                entries.append(entry)
+            save_data(self.court_file, entries)
+            invalidate(self.court_file)
+
+    def clear_courts(self):
+        with self.lock:
+            save_data(self.court_file, [])
+            invalidate(self.court_file)
+
+    def save_round(self, night, round_number, matches):
+        entry = {'night': night, 'round': round_number,
+                 'matches': [[court, list(match)] for court, match in matches],
+                 'created': datetime.now().isoformat(timespec='seconds')}
+        count('disk.write')
+        with self.lock:
+            with open(self.round_file, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def load_rounds(self, night):
+        rounds = {}
+        if os.path.exists(self.round_file):
+            count('disk.read')
+            with open(self.round_file) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry['night'] == night:
+                        rounds[entry['round']] = [(court, tuple(match)) for court, match in entry['matches']]
+        return [(number, rounds[number]) for number in sorted(rounds)]
+
+    def read_scores(self):
+        return self.score_log.read_scores()
+
+    def append_scores(self, rows):
+        with self.lock:
+            self.score_log.append_scores(rows)
+
+    def rewrite_scores(self, rows):
+        with self.lock:
+            self.score_log.rewrite_scores(rows)
+
+    def clear_scores(self):
+        with self.lock:
+            self.score_log.clear_scores()
+
+    def claim_import(self):
+        # True for the first caller only; see import_legacy
+        with self.lock:
+            if os.path.exists(self.import_file):
+                return False
+            save_data(self.import_file, {'imported': datetime.now().isoformat(timespec='seconds')})
+            return True
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS courts (name TEXT PRIMARY KEY, details TEXT);
+CREATE TABLE IF NOT EXISTS rounds (
+    night TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    PRIMARY KEY (night, round)
+);
+CREATE TABLE IF NOT EXISTS matches (
+    night TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    court TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    PRIMARY KEY (night, round, court, slot)
+);
+CREATE INDEX IF NOT EXISTS matches_player ON matches (player);
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    night TEXT NOT NULL,
+    round TEXT NOT NULL,
+    court TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    player TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_round ON scores (night, round, player);
+CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL);
+"""
+
+
+class SQLiteStorage:
+    def __init__(self, path='tennis.db'):
+        self.path = path
+        self.key = path
+        self.local = threading.local()
+        conn = sqlite3.connect(path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def connect(self):
+        # sqlite3 connections can't cross threads, so each script thread
+        # gets its own; WAL lets readers carry on while another writes.
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def version(self, name):
+        count('db.read')
+        row = self.connect().execute('SELECT version FROM versions WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump(self, conn, name):
+        # Runs inside the writing transaction, so readers in any session or
+        # process see the new version exactly when they can see the data.
+        conn.execute('INSERT OR IGNORE INTO versions VALUES (?, 0)', (name,))
+        conn.execute('UPDATE versions SET version = version + 1 WHERE name = ?', (name,))
+
+    def _names(self, table):
+        def load():
+            count('db.read')
+            cursor = self.connect().execute(f'SELECT name FROM {table} ORDER BY rowid')
+            return tuple(name for (name,) in cursor)
+        return cached((self.path, table), self.version(table), load)
+
+    def _add(self, table, name):
+        count('db.write')
+        with self.connect() as conn:
+            cursor = conn.execute(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)', (name,))
+            if cursor.rowcount > 0:
+                self._bump(conn, table)
+        return cursor.rowcount > 0
+
+    def _remove(self, table, name):
+        count('db.write')
+        with self.connect() as conn:
+            cursor = conn.execute(f'DELETE FROM {table} WHERE name = ?', (name,))
+            if cursor.rowcount > 0:
+                self._bump(conn, table)
+        return cursor.rowcount > 0
+
+    def _clear(self, table):
+        count('db.write')
+        with self.connect() as conn:
+            conn.execute(f'DELETE FROM {table}')
+            self._bump(conn, table)
+
+    def players(self):
+        return self._names('players')
+
+    def add_player(self, name):
+        return self._add('players', name)
+
+    def remove_player(self, name):
+        return self._remove('players', name)
+
+    def clear_players(self):
+        self._clear('players')
+
+    def court_entries(self):
+        def load():
+            count('db.read')
+            cursor = self.connect().execute('SELECT name, details FROM courts ORDER BY rowid')
+            return tuple(json.loads(details) if details else name for name, details in cursor)
+        return copy_entries(cached((self.path, 'court_entries'), self.version('courts'), load))
+
+    def courts(self):
+        return self._names('courts')
+
+    def add_court(self, name):
+        return self._add('courts', name)
+
+    def save_court(self, entry):
+        details = None if isinstance(entry, str) else json.dumps(entry)
+        count('db.write')
+        with self.connect() as conn:
+            conn.execute('INSERT INTO courts (name, details) VALUES (?, ?) '
+                         'ON CONFLICT(name) DO UPDATE SET details = excluded.details',
+                         (court_name(entry), details))
+            self._bump(conn, 'courts')
+
+    def remove_court(self, name):
+        return self._remove('courts', name)
+
+    def clear_courts(self):
+        self._clear('courts')
+
+    def save_round(self, night, round_number, matches):
+        created = datetime.now().isoformat(timespec='seconds')
+        rows = [(night, round_number, str(court), slot, player)
+                for court, match in matches for slot, player in enumerate(match)]
+        count('db.write')
+        with self.connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO rounds VALUES (?, ?, ?)', (night, round_number, created))
+            conn.execute('DELETE FROM matches WHERE night = ? AND round = ?', (night, round_number))
+            conn.executemany('INSERT INTO matches VALUES (?, ?, ?, ?, ?)', rows)
+            self._bump(conn, 'rounds')
+
+    def load_rounds(self, night):
+        rounds = {}
+        count('db.read')
+        cursor = self.connect().execute(
+            'SELECT round, court, player FROM matches WHERE night = ? ORDER BY round, rowid', (night,))
+        for number, court, player in cursor:
+            courts = rounds.setdefault(number, {})
+            courts.setdefault(court, []).append(player)
+        return [(number, [(court, tuple(match)) for court, match in rounds[number].items()])
+                for number in sorted(rounds)]
+
+    def read_scores(self):
+        count('db.read')
+        cursor = self.connect().execute(f'SELECT {", ".join(FIELDS)} FROM scores ORDER BY id')
+        return [dict(zip(FIELDS, row)) for row in cursor]
+
+    def append_scores(self, rows):
+        placeholders = ', '.join('?' for _ in FIELDS)
+        count('db.write')
+        with self.connect() as conn:
+            conn.executemany(f'INSERT INTO scores ({", ".join(FIELDS)}) VALUES ({placeholders})',
+                             [tuple(row[field] for field in FIELDS) for row in rows])
+            self._bump(conn, 'scores')
+
+    def rewrite_scores(self, rows):
+        placeholders = ', '.join('?' for _ in FIELDS)
+        count('db.write')
+        with self.connect() as conn:
+            conn.execute('DELETE FROM scores')
+            conn.executemany(f'INSERT INTO scores ({", ".join(FIELDS)}) VALUES ({placeholders})',
+                             [tuple(row[field] for field in FIELDS) for row in rows])
+            self._bump(conn, 'scores')
+
+    def clear_scores(self):
+        self._clear('scores')
+
+    def claim_import(self):
+        # True for the first caller only; see import_legacy. A database
+        # written to before the marker existed counts as imported already.
+        count('db.write')
+        with self.connect() as conn:
+            used = conn.execute("SELECT COUNT(*) FROM versions WHERE name != 'imported'").fetchone()[0]
+            cursor = conn.execute("INSERT OR IGNORE INTO versions VALUES ('imported', 1)")
+        return cursor.rowcount > 0 and not used
+
+
+def get_storage(kind=None):
+    # One instance per backend
+    kind = kind or os.environ.get('TENNIS_STORAGE', 'sqlite')
+    if kind == 'json':
+        return shared(('storage', kind), JSONStorage)
+    return shared(('storage', kind), lambda: SQLiteStorage(os.environ.get('TENNIS_DB', 'tennis.db')))
+
+
+def import_legacy(storage, players=(), courts=(), score_file=None):
+    # One-off copy of the old flat files into a new store. The store keeps a
+    # marker once it's done, so players or courts cleared later stay cleared
+    # instead of coming back from the old files on the next session.
+    if not storage.claim_import():
+        return
+    if not storage.players():
+        for name in players:
+            storage.add_player(name)
+    if not storage.courts():
+        for entry in courts:
+            storage.save_court(entry)
+    if score_file and not isinstance(storage, JSONStorage) and not storage.read_scores():
+        rows = CSVScoreLog(score_file).read_scores()
+        if rows:
+            storage.append_scores(rows)